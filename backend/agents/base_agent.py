@@ -1,31 +1,304 @@
+import json
+import logging
 import os
-from langchain_openai import AzureChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from dotenv import load_dotenv
+from cache import cache_key, get_cache
+from deadline import Deadline, DeadlineExceeded, RequestCancelled
+from gazetteer import normalize
+from json_stream import JsonArrayStream
+from logging_setup import in_context, log_payload
+from poi_store import destination_key, get_poi_store, trip_budget_level
+from startup import lazy_import, timed
+from upstream import upstream_slot
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
 class BaseAgent:
     """Base Agent"""
 
+    # Minimum time left in the request budget for a web search to be worth starting
+    MIN_SEARCH_SECONDS = 2
+
+    # How long past the deadline to wait for enrichment already running (its calls time out at the deadline)
+    ENRICH_GRACE_SECONDS = 1
+
+    # Agents that search the web get a Tavily client (when TAVILY_API_KEY is set)
+    uses_search = False
+
     def __init__(self):
-        self.llm = AzureChatOpenAI(
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
-            deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
-            temperature=0.7,
-            max_tokens=3000
-        )
-
-
-    def invoke(self, system_prompt:str, user_prompt:str) -> str:
-        """Invoke the LLM with user and system prompt"""
-        messages = [
-            SystemMessage(content=system_prompt),
-            HumanMessage(content=user_prompt)
+        # Clients are built on first use, so constructing agents (and the app) stays cheap
+        self._llm = None
+        self._tavily = None
+        self._clients_lock = threading.Lock()
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._clients_lock:
+                if self._llm is None:
+                    AzureChatOpenAI = lazy_import("langchain_openai").AzureChatOpenAI
+                    with timed(f"{type(self).__name__}.llm", "construct"):
+                        self._llm = AzureChatOpenAI(
+                            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+                            api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                            api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                            deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+                            temperature=0.7,
+                            max_tokens=3000
+                        )
+        return self._llm
+
+    @property
+    def tavily(self):
+        tavily_key = os.getenv("TAVILY_API_KEY")
+        if self._tavily is None and self.uses_search and tavily_key:
+            with self._clients_lock:
+                if self._tavily is None:
+                    TavilyClient = lazy_import("tavily").TavilyClient
+                    with timed(f"{type(self).__name__}.tavily", "construct"):
+                        self._tavily = TavilyClient(api_key=tavily_key)
+        return self._tavily
+
+    def warm_up(self):
+        """Build the clients now instead of on the first request"""
+        self.llm
+        self.tavily
+
+    def web_search(self, query: str, deadline: Deadline | None = None, destination_id: str | None = None) -> list:
+        """Tavily web search, skipped when there is not enough time left in the request budget"""
+        if not self.tavily:
+            return []
+
+        if deadline is not None:
+            deadline.raise_if_cancelled("http_calls")
+
+        if deadline is not None and not deadline.has_time_for(self.MIN_SEARCH_SECONDS):
+            deadline.mark_degraded("web_search")
+            return []
+
+        try:
+            timeout = deadline.timeout(60) if deadline is not None else 60
+
+            def search():
+                try:
+                    with upstream_slot("tavily"):
+                        return self.tavily.search(query, max_results=5, timeout=timeout).get('results', [])
+                except Exception as e:
+                    self._raise_if_out_of_time(deadline, e)
+                    raise
+
+            # Requests for the same destination share one Tavily call
+            return get_cache("tavily").get_or_compute(
+                cache_key(destination_id, query, 5), search,
+                timeout=deadline.remaining() if deadline is not None else None
+            )
+        except RequestCancelled:
+            raise
+        except Exception as e:
+            logger.warning("Tavily search error: %s", e)
+            if deadline is not None and deadline.expired():
+                deadline.mark_degraded("web_search")
+            return []
+
+
+    def recall(self, kind: str, travel_details: dict, limit: int) -> list:
+        """Fresh stored items for this destination, best matches for interests and budget first"""
+        if os.getenv("POI_STORE_ENABLED", "1").lower() in ("0", "false", "no"):
+            return []
+        try:
+            return get_poi_store().find(
+                kind,
+                destination_key(travel_details),
+                interests=travel_details.get('interests', []),
+                budget_level=trip_budget_level(travel_details),
+                limit=limit
+            )
+        except sqlite3.Error as e:
+            logger.warning("POI store read error: %s", e)
+            return []
+
+    def remember(self, kind: str, travel_details: dict, items: list):
+        """Persist enriched items so the next request for this destination can skip generation"""
+        if os.getenv("POI_STORE_ENABLED", "1").lower() in ("0", "false", "no"):
+            return
+        try:
+            get_poi_store().upsert(kind, destination_key(travel_details), items)
+        except sqlite3.Error as e:
+            logger.warning("POI store write error: %s", e)
+
+    def merge_known(self, known: list, items: list) -> list:
+        """Stored items first, then generated ones the store did not already have"""
+        known_names = {normalize(item.get('name', '')) for item in known}
+        return known + [item for item in items if normalize(item.get('name', '')) not in known_names]
+
+    def known_items_note(self, items: list) -> str:
+        """Prompt line asking the LLM to fill the gaps instead of repeating stored items"""
+        if not items:
+            return ""
+        names = ", ".join(item.get('name', '') for item in items)
+        return f"Already recommended (suggest different ones): {names}"
+
+    def _messages(self, system_prompt: str, user_prompt: str) -> list:
+        messages = lazy_import("langchain_core.messages")
+        return [
+            messages.SystemMessage(content=system_prompt),
+            messages.HumanMessage(content=user_prompt)
         ]
 
-        response = self.llm.invoke(messages)
+    def invoke(self, system_prompt:str, user_prompt:str, deadline: Deadline | None = None) -> str:
+        """Invoke the LLM with user and system prompt, bounded by the request deadline if given"""
+        messages = self._messages(system_prompt, user_prompt)
+
+        kwargs = {}
+        if deadline is not None:
+            deadline.raise_if_cancelled("llm_calls")
+            kwargs['timeout'] = deadline.timeout()
+
+        log_payload(logger, "LLM prompt", user_prompt)
+
+        def call():
+            try:
+                with upstream_slot("llm"):
+                    content = self.llm.invoke(messages, **kwargs).content
+            except Exception as e:
+                self._raise_if_out_of_time(deadline, e)
+                raise
+            log_payload(logger, "LLM response", content)
+            return content
+
+        # Identical prompts can share one completion (on under serve.py and batch.py, off by default)
+        if self._llm_cache_enabled():
+            return get_cache("llm").get_or_compute(
+                self._llm_cache_key(system_prompt, user_prompt), call, timeout=deadline.remaining() if deadline is not None else None
+            )
+
+        return call()
+
+    @staticmethod
+    def _raise_if_out_of_time(deadline: Deadline | None, error: Exception):
+        """Report a call that failed because this request's time ran out as DeadlineExceeded
+
+        Shared callers waiting on the same call then retry it with their own time
+        instead of taking this request's failure as the result.
+        """
+        if deadline is None:
+            return
+        if deadline.cancelled:
+            raise RequestCancelled(f"Request cancelled ({deadline.cancel_reason})") from error
+        # The call's timeout was the time left, so a failure with (almost) none left is ours
+        if deadline.remaining() < 0.5:
+            raise DeadlineExceeded(f"Call cut short by the request deadline: {error}") from error
+
+    def _llm_cache_enabled(self) -> bool:
+        return os.getenv("LLM_CACHE_ENABLED", "").lower() in ("1", "true", "yes")
+
+    def _llm_cache_key(self, system_prompt: str, user_prompt: str) -> str:
+        return cache_key(os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"), system_prompt, user_prompt)
+
+    def stream(self, system_prompt: str, user_prompt: str, deadline: Deadline | None = None):
+        """Invoke the LLM and yield the completion text chunk by chunk"""
+        messages = self._messages(system_prompt, user_prompt)
+
+        kwargs = {}
+        if deadline is not None:
+            deadline.raise_if_cancelled("llm_calls")
+            kwargs['timeout'] = deadline.timeout()
+
+        log_payload(logger, "LLM prompt", user_prompt)
+
+        with upstream_slot("llm"):
+            for chunk in self.llm.stream(messages, **kwargs):
+                if deadline is not None:
+                    # Raising here closes the stream, aborting the completion mid-way
+                    deadline.raise_if_cancelled("llm_calls")
+                    deadline.timeout()
+                if chunk.content:
+                    yield chunk.content
+
+    def parse_json_response(self, response: str):
+        """Parse an LLM response that may be wrapped in a ```json fence"""
+        response = response.strip()
+        if response.startswith("```json"):
+            response = response[7:]
+        if response.startswith("```"):
+            response = response[3:]
+        if response.endswith("```"):
+            response = response[:-3]
+        return json.loads(response.strip())
+
+    def generate_list(self, system_prompt: str, user_prompt: str, enrich, deadline: Deadline | None = None) -> list:
+        """Generate a JSON array with the LLM and call enrich(index, item) on every element
+
+        When streaming, each element is handed to an enrichment worker as soon as it is
+        complete, so image and maps lookups overlap the rest of the completion. The workers
+        (ENRICH_WORKERS) belong to this call, so requests never queue behind each other's
+        lookups, and waiting for them is bounded by the deadline. The result
+        is the same as parsing the whole response first: the full text must still parse,
+        and if the streamed elements differ from it they are thrown away and the parsed
+        list is enriched instead. Raises json.JSONDecodeError like json.loads.
+
+        With LLM_CACHE_ENABLED a cached completion is used without streaming, and a
+        streamed completion that parses is cached. Unlike invoke(), identical prompts
+        streaming at the same time are not merged into one call.
+        """
+        streaming = os.getenv("LLM_STREAMING", "1").lower() not in ("0", "false", "no")
+        llm_key = self._llm_cache_key(system_prompt, user_prompt) if self._llm_cache_enabled() else None
+        found, text = False, None
+        if streaming and llm_key is not None:
+            found, text = get_cache("llm").peek(llm_key)
+        if found or not streaming:
+            if not found:
+                text = self.invoke(system_prompt, user_prompt, deadline)
+            items = self.parse_json_response(text)
+            for i, item in enumerate(items):
+                enrich(i, item)
+            return items
+
+        parser = JsonArrayStream()
+        chunks = []
+        raw_items = []
+        items = []
+        futures = []
+        profile = deadline.profile if deadline is not None else None
+        executor = ThreadPoolExecutor(max_workers=int(os.getenv("ENRICH_WORKERS", "8")), thread_name_prefix="enrich")
+        try:
+            for chunk in self.stream(system_prompt, user_prompt, deadline):
+                chunks.append(chunk)
+                for raw, item in parser.feed(chunk):
+                    if profile is None:
+                        futures.append(in_context(executor, enrich, len(items), item))
+                    else:
+                        futures.append(in_context(executor, profile.run, "enrich", enrich, len(items), item))
+                    raw_items.append(raw)
+                    items.append(item)
+
+            # Wait for the workers before returning or discarding their items
+            timeout = deadline.remaining() + self.ENRICH_GRACE_SECONDS if deadline is not None else None
+            _, not_done = wait(futures, timeout=timeout)
+            if not_done:
+                logger.warning("⏱️ %d enrichment(s) unfinished at the deadline", len(not_done))
+                deadline.mark_degraded("enrichment")
+            for future in futures:
+                if future.done():
+                    future.result()
+        finally:
+            # Enrichment that has not started yet is pointless once the stream failed or time ran out
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        text = "".join(chunks)
+        log_payload(logger, "LLM response", text)
+        full = self.parse_json_response(text)
+        if llm_key is not None:
+            get_cache("llm").put(llm_key, text)
 
-        return response.content
\ No newline at end of file
+        if parser.failed or json.loads("[" + ",".join(raw_items) + "]") != full:
+            items = full
+            for i, item in enumerate(items):
+                enrich(i, item)
+        return items
\ No newline at end of file
@@ -1,10 +1,16 @@
 import json
+import logging
 from .base_agent import BaseAgent
+from budget import parse_amount
+from deadline import Deadline
+from logging_setup import truncate
+
+logger = logging.getLogger(__name__)
 
 class ExtractionAgent(BaseAgent):
     """Agent responsible for the extracting useful information from the user's prompt"""
 
-    def extract_details(self, user_input:str) -> dict:
+    def extract_details(self, user_input:str, deadline: Deadline | None = None) -> dict:
         
         system_prompt = "You are a travel data extraction expert. Extract travel information and return ONLY valid JSON, nothing else. If information is missing, make reasonable estimates based on context."
 
@@ -16,7 +22,8 @@ class ExtractionAgent(BaseAgent):
 
             {{
 
-            "destination": "city, country",
+            "destination": "city, country" (for a multi-city trip, the country or region, e.g. "Japan"),
+            "destinations": [{{"city": "city, country", "days": number of days in this city}}, ...] (every city in visiting order; days add up to duration),
             "duration": number of days (estimate if not specified, default 7),
             "budget": estimated budget in USD (estimate if not specified, default 2000),
             "travel_type": "Adventure/Cultural/Relaxation/Family/Romantic/Business/Solo",
@@ -28,8 +35,7 @@ class ExtractionAgent(BaseAgent):
     Return ONLY the JSON object, no other text.
     """
         
-        response = self.invoke(system_prompt, user_prompt)
-        print(response)
+        response = self.invoke(system_prompt, user_prompt, deadline)
 
         try:
             response = response.strip()
@@ -41,18 +47,46 @@ class ExtractionAgent(BaseAgent):
                 response = response[:-3]
             response = response.strip()
 
-            return json.loads(response)
+            return self._normalize_destinations(json.loads(response))
         except json.JSONDecodeError as e:
 
-            print(f"JSON decode error: {e}")
-            print(f"Response was: {response}")
+            logger.warning("JSON decode error: %s; response was: %s", e, truncate(response))
 
             return {
                 "destination":"unknown",
+                "destinations":[{"city":"unknown", "days":7}],
                 "duration":7,
                 "budget":"2000",
                 "travel_type":"General",
                 "travelers":2,
                 "interests":["sightseeing"],
                 "overview":"Exciting destination to explore"
-            }
\ No newline at end of file
+            }
+
+    def _normalize_destinations(self, details: dict) -> dict:
+        """Make sure 'destinations' is an ordered list of cities whose days add up to the duration"""
+        duration = max(int(parse_amount(details.get("duration"), 7.0)), 1)
+        details["duration"] = duration
+        destinations = [
+            d for d in (details.get("destinations") or [])
+            if isinstance(d, dict) and d.get("city")
+        ]
+
+        if not destinations:
+            details["destinations"] = [{"city": details.get("destination", "unknown"), "days": duration}]
+            return details
+
+        # Split any unassigned days evenly, then trust the per-city days for the total
+        def has_days(d):
+            return isinstance(d.get("days"), (int, float)) and d["days"] > 0
+
+        missing = [d for d in destinations if not has_days(d)]
+        if missing:
+            assigned = sum(d["days"] for d in destinations if has_days(d))
+            share = max(1, round((duration - assigned) / len(missing)))
+            for d in missing:
+                d["days"] = share
+
+        details["destinations"] = [{"city": d["city"], "days": int(d["days"])} for d in destinations]
+        details["duration"] = sum(d["days"] for d in details["destinations"])
+        return details
\ No newline at end of file
@@ -1,19 +1,29 @@
 import json
-import os
+import logging
+import re
 from .base_agent import BaseAgent
+from deadline import Deadline
 from helper import Helper
-from tavily import TavilyClient
+
+logger = logging.getLogger(__name__)
 
 class HotelsAgent(BaseAgent):
     """Agent responsible for finding hotels with web search"""
+
+    uses_search = True
+
+    # Enough stored hotels to answer without searching or generating
+    MIN_ITEMS = 5
     
     def __init__(self):
         super().__init__()
-        tavily_key = os.getenv("TAVILY_API_KEY")
-        self.tavily = TavilyClient(api_key=tavily_key) if tavily_key else None
         self.helper = Helper()
     
-    def find_hotels(self, travel_details: dict) -> list:
+    def search_query(self, destination: str) -> str:
+        """Web search query; depends only on the destination so it can be prefetched before extraction ends"""
+        return f"best hotels to stay in {destination} accommodation reviews"
+
+    def find_hotels(self, travel_details: dict, deadline: Deadline | None = None) -> list:
         """Find hotel recommendations with real data"""
         
         destination = travel_details.get('destination', 'Unknown')
@@ -22,15 +32,15 @@ class HotelsAgent(BaseAgent):
         travelers = travel_details.get('travelers', 2)
         travel_type = travel_details.get('travel_type', 'General')
         
+        # Retrieval first: only search and generate for what the store cannot answer
+        known = [self._reprice(hotel, duration) for hotel in self.recall("hotel", travel_details, self.MIN_ITEMS)]
+        if len(known) >= self.MIN_ITEMS:
+            logger.info("📚 Using %d stored hotels for %s", len(known), destination)
+            return known
+        
         # Web search for real hotels
-        search_results = []
-        if self.tavily:
-            try:
-                query = f"best hotels to stay in {destination} accommodation reviews"
-                search_response = self.tavily.search(query, max_results=5)
-                search_results = search_response.get('results', [])
-            except Exception as e:
-                print(f"Tavily search error: {e}")
+        query = self.search_query(destination)
+        search_results = self.web_search(query, deadline, travel_details.get('destination_id'))
         
         web_context = "\n".join([
             f"- {result.get('title', '')}: {result.get('content', '')[:200]}"
@@ -48,6 +58,7 @@ Web Search Results:
 
 Total Budget: ${budget}
 Travel Type: {travel_type}
+{self.known_items_note(known)}
 
 Create a JSON array of 5-6 hotels across different budget ranges:
 [
@@ -70,34 +81,33 @@ Create a JSON array of 5-6 hotels across different budget ranges:
 
 Return ONLY the JSON array, no other text."""
         
-        response = self.invoke(system_prompt, user_prompt)
-        
-        try:
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
-            response = response.strip()
+        # Add image URLs from Google and Maps links
+        def enrich(i, hotel):
+            if i < len(search_results) and 'url' in search_results[i]:
+                hotel['source_url'] = search_results[i]['url']
             
-            hotels = json.loads(response)
+            # Get image from Google Custom Search
+            hotel_query = f"{hotel.get('name', '')} {destination} hotel"
+            images = self.helper.search_images(hotel_query, deadline=deadline)
+            hotel['image_url'] = images[0] if images else f"https://source.unsplash.com/800x600/?hotel,luxury,accommodation"
             
-            # Add image URLs from Google and Maps links
-            for i, hotel in enumerate(hotels):
-                if i < len(search_results) and 'url' in search_results[i]:
-                    hotel['source_url'] = search_results[i]['url']
-                
-                # Get image from Google Custom Search
-                hotel_query = f"{hotel.get('name', '')} {destination} hotel"
-                images = self.helper.search_images(hotel_query)
-                hotel['image_url'] = images[0] if images else f"https://source.unsplash.com/800x600/?hotel,luxury,accommodation"
-                
-                # Add Google Maps link
-                hotel['maps_link'] = self.helper.get_maps_link(hotel.get('name', ''), destination)
+            # Add Google Maps link
+            hotel['maps_link'] = self.helper.get_maps_link(hotel.get('name', ''), destination)
+        
+        try:
+            hotels = self.generate_list(system_prompt, user_prompt, enrich, deadline)
             
-            return hotels
+            self.remember("hotel", travel_details, hotels)
+            return self.merge_known(known, hotels)
         except json.JSONDecodeError as e:
-            print(f"JSON decode error in hotels: {e}")
+            logger.warning("JSON decode error in hotels: %s", e)
             return []
+
+    def _reprice(self, hotel: dict, duration: int) -> dict:
+        """Stored hotels were priced for another trip length; recompute the stay total from the nightly rate"""
+        rates = re.findall(r'\d+', str(hotel.get('price_per_night', '')).replace(',', ''))
+        if rates:
+            low = int(rates[0]) * duration
+            high = int(rates[1]) * duration if len(rates) > 1 else low
+            hotel['total_estimated'] = f"${low}-{high} for {duration} nights" if high != low else f"${low} for {duration} nights"
+        return hotel
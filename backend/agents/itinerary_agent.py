@@ -1,26 +1,35 @@
 import json
+import logging
 from .base_agent import BaseAgent
+from deadline import Deadline
+
+logger = logging.getLogger(__name__)
 
 class ItineraryAgent(BaseAgent):
     """Agent responsible for creating day-by-day itinerary"""
     
-    def create_itinerary(self, travel_details: dict, places: list, restaurants: list) -> list:
+    def create_itinerary(self, travel_details: dict, places: list, restaurants: list, deadline: Deadline | None = None) -> list:
         """Create detailed day-by-day itinerary using places and restaurants"""
         
         destination = travel_details.get('destination', 'Unknown')
         duration = travel_details.get('duration', 7)
         interests = travel_details.get('interests', [])
         budget = travel_details.get('budget', 2000)
+        destinations = travel_details.get('destinations') or [{'city': destination, 'days': duration}]
+
+        # Multi-city trips get a route and a longer list, grouped by city
+        limit = 10 * len(destinations)
+        route = " -> ".join(f"{d['city']} ({d['days']} days)" for d in destinations)
 
         # Prepare context
         places_summary = "\n".join([
-            f"- {p.get('name', '')}: {p.get('category', '')} - {p.get('location', '')} - {p.get('entry_fee', '')}"
-            for p in places[:10]
+            f"- {p.get('name', '')}: {p.get('category', '')} - {p.get('location', '')}, {p.get('city', destination)} - {p.get('entry_fee', '')}"
+            for p in places[:limit]
         ]) if places else "No places data"
         
         restaurants_summary = "\n".join([
-            f"- {r.get('name', '')}: {r.get('cuisine', '')} - {r.get('budget_level', '')}"
-            for r in restaurants[:10]
+            f"- {r.get('name', '')}: {r.get('cuisine', '')} - {r.get('budget_level', '')} - {r.get('city', destination)}"
+            for r in restaurants[:limit]
         ]) if restaurants else "No restaurants data"
         
         system_prompt = """You are an expert itinerary planner creating realistic, well-paced daily schedules.
@@ -30,6 +39,9 @@ class ItineraryAgent(BaseAgent):
 
         user_prompt = f"""Create a detailed day-by-day itinerary for {duration} days in {destination}.
 
+        Route (follow this order and number of days per city, including travel between cities):
+        {route}
+
         Available Places to Visit:
         {places_summary}
 
@@ -68,7 +80,7 @@ class ItineraryAgent(BaseAgent):
 
         Return ONLY the JSON array, no other text."""
 
-        response = self.invoke(system_prompt, user_prompt)
+        response = self.invoke(system_prompt, user_prompt, deadline)
         
         try:
             response = response.strip()
@@ -82,7 +94,7 @@ class ItineraryAgent(BaseAgent):
             
             return json.loads(response)
         except json.JSONDecodeError as e:
-            print(f"JSON decode error in itinerary: {e}")
+            logger.warning("JSON decode error in itinerary: %s", e)
             return []
 
         
@@ -1,33 +1,42 @@
 import json
-import os
+import logging
 from .base_agent import BaseAgent
+from deadline import Deadline
 from helper import Helper
-from tavily import TavilyClient
+
+logger = logging.getLogger(__name__)
 
 class PlaceAgent(BaseAgent):
 
+    uses_search = True
+
+    # Enough stored places to answer without searching or generating
+    MIN_ITEMS = 6
+
     def __init__(self):
         super().__init__()
-        tavily_key = os.getenv("TAVILY_API_KEY")
-        self.tavily = TavilyClient(api_key=tavily_key) if tavily_key else None
         self.helper = Helper()
 
-    def find_places(self, travel_details:dict) -> list:
+    def search_query(self, destination: str) -> str:
+        """Web search query; depends only on the destination so it can be prefetched before extraction ends"""
+        return f"top tourist attractions places to visit in {destination}"
+
+    def find_places(self, travel_details:dict, deadline: Deadline | None = None) -> list:
         """Find top places to visit with real data from web search"""
         
         destination = travel_details.get('destination', 'Unknown')
         duration = travel_details.get('duration', 7)
         interests = travel_details.get('interests', [])
 
+        # Retrieval first: only search and generate for what the store cannot answer
+        known = self.recall("place", travel_details, self.MIN_ITEMS)
+        if len(known) >= self.MIN_ITEMS:
+            logger.info("📚 Using %d stored places for %s", len(known), destination)
+            return known
+
         # Web search for real places
-        search_results = []
-        if self.tavily:
-            try:
-                query = f"top tourist attractions places to visit in {destination} {' '.join(interests[:3])}"
-                search_response = self.tavily.search(query, max_results=5)
-                search_results = search_response.get('results', [])
-            except Exception as e:
-                print(f"Tavily search error: {e}")
+        query = self.search_query(destination)
+        search_results = self.web_search(query, deadline, travel_details.get('destination_id'))
         
         # Prepare context from web search
         web_context = "\n".join([
@@ -46,6 +55,7 @@ class PlaceAgent(BaseAgent):
 
             Interests: {', '.join(interests)}
             Budget level: ${travel_details.get('budget', 2000)}
+            {self.known_items_note(known)}
 
             Create a JSON array of 6-8 places with this exact structure:
             [
@@ -67,35 +77,25 @@ class PlaceAgent(BaseAgent):
 
         Return ONLY the JSON array, no other text."""
 
-        response = self.invoke(system_prompt, user_prompt)
+        # Add image URLs from Google and Maps links
+        def enrich(i, place):
+            if i < len(search_results) and 'url' in search_results[i]:
+                place['source_url'] = search_results[i]['url']
+            
+            # Get image from Google Custom Search
+            place_query = f"{place.get('name', '')} {destination} landmark"
+            images = self.helper.search_images(place_query, deadline=deadline)
+            place['image_url'] = images[0] if images else f"https://source.unsplash.com/800x600/?{place.get('category', 'landmark')},tourism"
+            
+            # Add Google Maps link
+            place['maps_link'] = self.helper.get_maps_link(place.get('name', ''), destination)
+            place['image_search'] = f"{place['name']} {destination} tourist attraction"
 
         try:
-            response = response.strip()
-            if(response.startswith("```json")):
-                response = response[7:]
-            if(response.startswith("```")):
-                response = response[3:]
-            if(response.endswith("```")):
-                response = response[:-3]
-            response = response.strip()
-
-            places = json.loads(response)
-            
-            # Add image URLs from Google and Maps links
-            for i, place in enumerate(places):
-                if i < len(search_results) and 'url' in search_results[i]:
-                    place['source_url'] = search_results[i]['url']
-                
-                # Get image from Google Custom Search
-                place_query = f"{place.get('name', '')} {destination} landmark"
-                images = self.helper.search_images(place_query)
-                place['image_url'] = images[0] if images else f"https://source.unsplash.com/800x600/?{place.get('category', 'landmark')},tourism"
-                
-                # Add Google Maps link
-                place['maps_link'] = self.helper.get_maps_link(place.get('name', ''), destination)
-                place['image_search'] = f"{place['name']} {destination} tourist attraction"
-            return places
+            places = self.generate_list(system_prompt, user_prompt, enrich, deadline)
+
+            self.remember("place", travel_details, places)
+            return self.merge_known(known, places)
         except json.JSONDecodeError as e:
-            print(f"JSON decode error in place agent : {e}")
-            print(f"response was {response}")
+            logger.warning("JSON decode error in place agent : %s", e)
             return []
\ No newline at end of file
@@ -1,19 +1,28 @@
 import json
-import os
+import logging
 from .base_agent import BaseAgent
+from deadline import Deadline
 from helper import Helper
-from tavily import TavilyClient
+
+logger = logging.getLogger(__name__)
 
 class RestaurantsAgent(BaseAgent):
     """Agent responsible for finding restaurants with web search"""
+
+    uses_search = True
+
+    # Enough stored restaurants to answer without searching or generating
+    MIN_ITEMS = 6
     
     def __init__(self):
         super().__init__()
-        tavily_key = os.getenv("TAVILY_API_KEY")
-        self.tavily = TavilyClient(api_key=tavily_key) if tavily_key else None
         self.helper = Helper()
     
-    def find_restaurants(self, travel_details: dict) -> list:
+    def search_query(self, destination: str) -> str:
+        """Web search query; depends only on the destination so it can be prefetched before extraction ends"""
+        return f"best restaurants to eat in {destination} local cuisine food"
+
+    def find_restaurants(self, travel_details: dict, deadline: Deadline | None = None) -> list:
         """Find restaurant recommendations with real data"""
         
         destination = travel_details.get('destination', 'Unknown')
@@ -21,15 +30,15 @@ class RestaurantsAgent(BaseAgent):
         interests = travel_details.get('interests', [])
         travelers = travel_details.get('travelers', 2)
         
+        # Retrieval first: only search and generate for what the store cannot answer
+        known = self.recall("restaurant", travel_details, self.MIN_ITEMS)
+        if len(known) >= self.MIN_ITEMS:
+            logger.info("📚 Using %d stored restaurants for %s", len(known), destination)
+            return known
+        
         # Web search for real restaurants
-        search_results = []
-        if self.tavily:
-            try:
-                query = f"best restaurants to eat in {destination} local cuisine food"
-                search_response = self.tavily.search(query, max_results=5)
-                search_results = search_response.get('results', [])
-            except Exception as e:
-                print(f"Tavily search error: {e}")
+        query = self.search_query(destination)
+        search_results = self.web_search(query, deadline, travel_details.get('destination_id'))
         
         web_context = "\n".join([
             f"- {result.get('title', '')}: {result.get('content', '')[:200]}"
@@ -47,6 +56,7 @@ Web Search Results:
 
 Budget: ${budget} total trip budget
 Preferences: {', '.join(interests)}
+{self.known_items_note(known)}
 
 Create a JSON array of 6-8 restaurants across different budget ranges:
 [
@@ -69,34 +79,24 @@ Create a JSON array of 6-8 restaurants across different budget ranges:
 
 Return ONLY the JSON array, no other text."""
         
-        response = self.invoke(system_prompt, user_prompt)
-        
-        try:
-            response = response.strip()
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
-            response = response.strip()
+        # Add image URLs from Google and Maps links
+        def enrich(i, restaurant):
+            if i < len(search_results) and 'url' in search_results[i]:
+                restaurant['source_url'] = search_results[i]['url']
             
-            restaurants = json.loads(response)
+            # Get image from Google Custom Search
+            restaurant_query = f"{restaurant.get('name', '')} {destination} restaurant food"
+            images = self.helper.search_images(restaurant_query, deadline=deadline)
+            restaurant['image_url'] = images[0] if images else f"https://source.unsplash.com/800x600/?{restaurant.get('cuisine', 'food')},restaurant"
             
-            # Add image URLs from Google and Maps links
-            for i, restaurant in enumerate(restaurants):
-                if i < len(search_results) and 'url' in search_results[i]:
-                    restaurant['source_url'] = search_results[i]['url']
-                
-                # Get image from Google Custom Search
-                restaurant_query = f"{restaurant.get('name', '')} {destination} restaurant food"
-                images = self.helper.search_images(restaurant_query)
-                restaurant['image_url'] = images[0] if images else f"https://source.unsplash.com/800x600/?{restaurant.get('cuisine', 'food')},restaurant"
-                
-                # Add Google Maps link
-                restaurant['maps_link'] = self.helper.get_maps_link(restaurant.get('name', ''), destination)
+            # Add Google Maps link
+            restaurant['maps_link'] = self.helper.get_maps_link(restaurant.get('name', ''), destination)
+        
+        try:
+            restaurants = self.generate_list(system_prompt, user_prompt, enrich, deadline)
             
-            return restaurants
+            self.remember("restaurant", travel_details, restaurants)
+            return self.merge_known(known, restaurants)
         except json.JSONDecodeError as e:
-            print(f"JSON decode error in restaurants: {e}")
+            logger.warning("JSON decode error in restaurants: %s", e)
             return []
@@ -1,10 +1,29 @@
 import json
-from flask import Flask, request, jsonify
-from flask_cors import CORS
-from workflow import TravelPlanWorkflow
+import logging
+import threading
+import uuid
+import startup
+from startup import timed
+with timed("flask", "import"):
+    from flask import Flask, Response, request, jsonify
+    from flask_cors import CORS
+with timed("workflow", "import"):
+    from workflow import TravelPlanWorkflow
+import metrics
+from cache import all_caches
+from circuit_breaker import all_breakers
+from deadline import Deadline
+from jobs import JobRegistry, shared_job_directory, watch_disconnect
+from plan_store import get_plan_store, plan_store_enabled, save_plan
+from logging_setup import configure_logging, request_context
+from profiling import collapsed, list_profiles, load_profile, profiles_authorized, start_profile
+from responses import add_item_ids, finalize, parse_fields, project
 from dotenv import load_dotenv
 load_dotenv()
 
+configure_logging()
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 CORS(app, origins=["http://localhost:3000", "http://127.0.0.1:3000"])
 
@@ -15,33 +34,190 @@ def add_cors(resp):
     if origin in ("http://localhost:3000", "http://127.0.0.1:3000"):
         resp.headers["Access-Control-Allow-Origin"] = origin
         resp.headers["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-        resp.headers["Access-Control-Allow-Headers"] = "Content-Type, Accept"
+        resp.headers["Access-Control-Allow-Headers"] = "Content-Type, Accept, X-Request-Deadline, X-Job-Id, X-Profile, X-Request-Id, If-None-Match"
+        resp.headers["Access-Control-Expose-Headers"] = "X-Job-Id, X-Profile-Id, X-Request-Id, ETag"
     return resp
 
-workflow = TravelPlanWorkflow()
+
+# ETag / 304 for GETs and gzip or brotli for large bodies
+@app.after_request
+def finalize_response(resp):
+    return finalize(resp, request)
+
+# Built on first use (or by the warm-up thread), not at import time
+_workflow = None
+_workflow_lock = threading.Lock()
+# Shared through CACHE_DIR under serve.py, so a cancel reaches the job on any worker
+jobs = JobRegistry(shared_job_directory())
+
+
+def get_workflow() -> TravelPlanWorkflow:
+    global _workflow
+    if _workflow is None:
+        with _workflow_lock:
+            if _workflow is None:
+                with timed("TravelPlanWorkflow", "construct"):
+                    _workflow = TravelPlanWorkflow()
+    return _workflow
+
+
+startup.mark_ready()
+if startup.warm_up_enabled():
+    startup.warm_up_in_background(lambda: get_workflow().warm_up())
 
 
 @app.route("/api/plan_travel", methods=["OPTIONS", "POST"])
 def Home():
     if request.method == "OPTIONS":
         return "", 204
-    print("POST /api/plan_travel hit", flush=True)
-    try:
-        data = request.get_json()
-        user_input = data.get('user_input')
+    # Every log record of this request (and of the workers it fans out to) carries this id
+    with request_context(request.headers.get("X-Request-Id")) as request_id:
+        logger.info("POST /api/plan_travel hit")
+        try:
+            data = request.get_json()
+            user_input = data.get('user_input')
+
+            if not user_input:
+                return jsonify({"error":"User input is required"}), 400
+
+            deadline = Deadline.from_request(request.headers.get("X-Request-Deadline"))
+
+            # Clients that send a job id can cancel it, or supersede it by re-submitting
+            job_id = request.headers.get("X-Job-Id") or uuid.uuid4().hex
+            headers = {"X-Job-Id": job_id, "X-Request-Id": request_id}
+            stop_watching = None
+            profile = None
+            try:
+                jobs.register(job_id, deadline)
+                stop_watching = watch_disconnect(request.environ, deadline)
+
+                # Admin header or sampling rate; None (and no overhead) for ordinary requests
+                profile = start_profile(request.headers.get("X-Profile"))
+                deadline.profile = profile
+                if profile is None:
+                    result = get_workflow().plan_travel(user_input, deadline)
+                else:
+                    with profile.track("plan_travel"):
+                        result = get_workflow().plan_travel(user_input, deadline)
+            finally:
+                if stop_watching is not None:
+                    stop_watching.set()
+                jobs.unregister(job_id, deadline)
+                if profile is not None:
+                    try:
+                        profile.save(job_id=job_id)
+                        headers["X-Profile-Id"] = profile.id
+                    except OSError as e:
+                        logger.warning("Could not save profile: %s", e)
+
+            if result.get('cancelled'):
+                # 499: client closed request; usually nobody is left to read it
+                return jsonify({"error":result['error'], "job_id":job_id}), 499, headers
+
+            if result.get('error'):
+                return jsonify({"error":result['error']}), 500, headers
+
+            # Stored for sharing links and analytics; reloaded with GET /api/plans/<plan_id>
+            plan_id = save_plan(result)
+            if plan_id:
+                result["plan_id"] = plan_id
+
+            # Item ids are plan store hashes, so details left out by `fields` can be fetched later
+            add_item_ids(result)
+            fields = parse_fields(request.args.get("fields") or data.get("fields"))
+            return jsonify(project(result, fields)), 200, headers
+
+        except Exception as e:
+            logger.exception("Plan request failed")
+            return jsonify({'error':str(e)}), 500, {"X-Request-Id": request_id}
+
+
+@app.route("/api/plan_travel/<job_id>/cancel", methods=["OPTIONS", "POST"])
+def cancel_plan(job_id):
+    if request.method == "OPTIONS":
+        return "", 204
+    if not jobs.cancel(job_id):
+        return jsonify({"error":"No running job with this id"}), 404
+    return jsonify({"job_id":job_id, "cancelled":True}), 202
+
+
+@app.route("/api/plans/<plan_id>", methods=["GET"])
+def get_plan(plan_id):
+    if not plan_store_enabled():
+        return jsonify({"error":"Plan store is disabled"}), 404
+    plan = get_plan_store().load(plan_id)
+    if plan is None:
+        return jsonify({"error":"Plan not found"}), 404
+    return jsonify(project(add_item_ids(plan), parse_fields(request.args.get("fields")))), 200
+
+
+@app.route("/api/items/<item_id>", methods=["GET"])
+def get_item(item_id):
+    """Full details of a place, restaurant or hotel by the `id` it had in a plan"""
+    if not plan_store_enabled():
+        return jsonify({"error":"Plan store is disabled"}), 404
+    stored = get_plan_store().get_object(item_id)
+    if stored is None:
+        return jsonify({"error":"Item not found"}), 404
+    return jsonify({"id":item_id, "kind":stored["kind"], **stored["item"]}), 200
+
+
+@app.route("/api/plans/export", methods=["GET"])
+def export_plans():
+    """Every stored plan as JSON lines, streamed as they are reassembled"""
+    if not plan_store_enabled():
+        return jsonify({"error":"Plan store is disabled"}), 404
+    since = request.args.get("since", 0, type=float)
+    store = get_plan_store()
+
+    def generate():
+        for plan in store.export(since):
+            yield json.dumps(plan, ensure_ascii=False) + "\n"
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+@app.route("/api/circuit_breakers", methods=["GET"])
+def circuit_breakers():
+    return jsonify({"breakers": all_breakers()}), 200
+
+
+@app.route("/api/profiles", methods=["GET"])
+def get_profiles():
+    if not profiles_authorized(request.headers.get("X-Profile")):
+        return jsonify({"error":"Forbidden"}), 403
+    return jsonify({"profiles": list_profiles()}), 200
+
 
-        if not user_input:
-            return jsonify({"error":"User input is required"}), 400
+@app.route("/api/profiles/<profile_id>", methods=["GET"])
+def get_profile(profile_id):
+    if not profiles_authorized(request.headers.get("X-Profile")):
+        return jsonify({"error":"Forbidden"}), 403
+    profile = load_profile(profile_id)
+    if profile is None:
+        return jsonify({"error":"Profile not found"}), 404
+    if request.args.get("format") == "collapsed":
+        return Response(collapsed(profile), mimetype="text/plain",
+                        headers={"Content-Disposition": f"attachment; filename={profile_id}.folded"})
+    return jsonify(profile), 200
 
-        result = workflow.plan_travel(user_input)
 
-        if result.get('error'):
-            return jsonify({"error":result['error']}), 500
+@app.route("/api/startup", methods=["GET"])
+def get_startup():
+    return jsonify(startup.report()), 200
 
-        return jsonify(result), 200
 
-    except Exception as e:
-        return jsonify({'error':str(e)}), 500
+@app.route("/api/metrics", methods=["GET"])
+def get_metrics():
+    counters = metrics.snapshot()
+    resolved = counters.get("destinations_resolved", 0)
+    attempted = resolved + counters.get("destinations_unresolved", 0)
+    return jsonify({
+        "counters": counters,
+        "destination_resolution_rate": round(resolved / attempted, 4) if attempted else None,
+        "caches": all_caches(),
+        "breakers": all_breakers()
+    }), 200
 
 
 if __name__ == '__main__':
@@ -0,0 +1,189 @@
+"""Bulk travel planning from a JSONL file of user inputs
+
+    python batch.py inputs.jsonl -o plans.jsonl --concurrency 16 --limit llm=8 --limit tavily=4
+
+Each input line is {"id": "...", "user_input": "..."} (id is optional and defaults to a hash
+of user_input). Results are appended to the output as JSONL as soon as each plan finishes,
+so re-running the same command after a crash skips every id that already succeeded.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from deadline import Deadline
+from logging_setup import configure_logging, request_context
+from plan_store import save_plan
+
+# Per-upstream concurrency unless UPSTREAM_LIMIT_<NAME> or --limit says otherwise
+DEFAULT_LIMITS = {"llm": 8, "tavily": 4, "images": 8, "google": 8}
+
+logger = logging.getLogger(__name__)
+
+
+def item_id(item: dict) -> str:
+    """Stable id for an input line, so results can be matched up on resume"""
+    if item.get("id"):
+        return str(item["id"])
+    return hashlib.sha1(item["user_input"].encode("utf-8")).hexdigest()[:16]
+
+
+def read_inputs(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                logger.warning("⚠️ Skipping line %d: %s", line_number, e)
+                continue
+            if not item.get("user_input"):
+                logger.warning("⚠️ Skipping line %d: no user_input", line_number)
+                continue
+            yield item
+
+
+def completed_ids(path: str) -> set:
+    """Ids that already have a successful result in the output file"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; that item is simply planned again
+                continue
+            if record.get("id") and not record.get("error"):
+                done.add(record["id"])
+    return done
+
+
+class JsonlWriter:
+    """Appends one JSON record per line, durably, from many worker threads"""
+
+    def __init__(self, stream, durable: bool):
+        self.stream = stream
+        self.durable = durable
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.stream.write(line)
+            self.stream.flush()
+            if self.durable:
+                os.fsync(self.stream.fileno())
+
+
+def plan_one(workflow, item: dict, deadline_seconds: float) -> dict:
+    record = {"id": item_id(item), "user_input": item["user_input"]}
+    try:
+        with request_context(record["id"]):
+            result = workflow.plan_travel(item["user_input"], Deadline(deadline_seconds))
+        if result.get("error"):
+            record["error"] = result["error"]
+        else:
+            record["result"] = result
+            plan_id = save_plan(result)
+            if plan_id:
+                result["plan_id"] = plan_id
+    except Exception as e:
+        record["error"] = str(e)
+    return record
+
+
+def run_batch(workflow, items, writer: JsonlWriter, concurrency: int, deadline_seconds: float) -> dict:
+    """Plan every item with at most `concurrency` plans in flight, writing results as they finish"""
+    stats = {"succeeded": 0, "failed": 0}
+    started = time.monotonic()
+
+    def record_done(future):
+        record = future.result()
+        writer.write(record)
+        stats["failed" if record.get("error") else "succeeded"] += 1
+        finished = stats["succeeded"] + stats["failed"]
+        rate = finished / max(time.monotonic() - started, 1e-6) * 3600
+        logger.info("📦 %d done (%d failed), %.0f plans/hour", finished, stats['failed'], rate)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+        pending = set()
+        for item in items:
+            if len(pending) >= concurrency:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    record_done(future)
+            pending.add(executor.submit(plan_one, workflow, item, deadline_seconds))
+
+        for future in wait(pending).done:
+            record_done(future)
+
+    return stats
+
+
+def parse_limits(values: list) -> dict:
+    limits = {}
+    for value in values:
+        name, _, limit = value.partition("=")
+        if not name or not limit.isdigit():
+            raise argparse.ArgumentTypeError(f"Expected NAME=N, got '{value}'")
+        limits[name] = int(limit)
+    return limits
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate travel plans in bulk from a JSONL file")
+    parser.add_argument("input", help="JSONL file with one {\"id\", \"user_input\"} object per line")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file, appended to and resumed from (default: stdout)")
+    parser.add_argument("--concurrency", type=int, default=8, help="plans in flight at once (default: 8)")
+    parser.add_argument("--limit", action="append", default=[], metavar="UPSTREAM=N",
+                        help="max concurrent calls per upstream: llm, tavily, images, google (repeatable; "
+                             "defaults: " + ", ".join(f"{name}={limit}" for name, limit in DEFAULT_LIMITS.items()) + ")")
+    parser.add_argument("--deadline", type=float, default=300, help="time budget per plan in seconds (default: 300)")
+    args = parser.parse_args(argv)
+
+    limits = parse_limits(args.limit)
+    configure_logging()
+
+    # Duplicate items reuse LLM completions; prompts carry the trip's own details, so others do not
+    os.environ.setdefault("LLM_CACHE_ENABLED", "1")
+    for name, limit in DEFAULT_LIMITS.items():
+        os.environ.setdefault(f"UPSTREAM_LIMIT_{name.upper()}", str(limit))
+
+    from upstream import set_upstream_limit
+    from workflow import TravelPlanWorkflow
+
+    for name, limit in limits.items():
+        set_upstream_limit(name, limit)
+
+    if args.output == "-":
+        # Logs go to stderr; keep stray prints from libraries out of the JSONL stream too
+        output, durable, done = sys.stdout, False, set()
+        sys.stdout = sys.stderr
+    else:
+        done = completed_ids(args.output)
+        output, durable = open(args.output, "a", encoding="utf-8"), True
+        if done:
+            logger.info("↩️ Resuming, %d plans already in %s", len(done), args.output)
+
+    items = (item for item in read_inputs(args.input) if item_id(item) not in done)
+
+    try:
+        stats = run_batch(TravelPlanWorkflow(), items, JsonlWriter(output, durable), args.concurrency, args.deadline)
+    finally:
+        if durable:
+            output.close()
+
+    logger.info("✅ Batch complete: %d succeeded, %d failed", stats['succeeded'], stats['failed'])
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
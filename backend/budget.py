@@ -0,0 +1,167 @@
+import math
+import os
+import re
+from typing import TYPE_CHECKING
+
+from startup import lazy_import
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# "$1,200-1,500" -> ["1,200", "1,500"]
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+TRANSPORTATION_RATE = 0.12
+MISCELLANEOUS_RATE = 0.08
+
+
+def parse_costs(values) -> "np.ndarray":
+    """Parse cost strings like '$50-100', '$50' or 'Free' into an (n, 2) array of (low, high)"""
+    np = lazy_import("numpy")
+    parsed = []
+    for value in values:
+        numbers = _NUMBER.findall(str(value or ""))[:2]
+        if not numbers:
+            parsed.append((0.0, 0.0))
+            continue
+        low = float(numbers[0].replace(",", ""))
+        high = float(numbers[-1].replace(",", ""))
+        parsed.append((min(low, high), max(low, high)))
+    return np.array(parsed, dtype=float).reshape(-1, 2)
+
+
+def parse_amount(value, default: float) -> float:
+    """A single amount such as 3000, '3000' or '$3,000'; `default` when there is no number"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    numbers = _NUMBER.findall(str(value or ""))
+    return float(numbers[0].replace(",", "")) if numbers else default
+
+
+def _number(value, default: float) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def budget_scenarios(budget: float) -> list:
+    """Budgets priced alongside the user's own, as fractions of it (BUDGET_SCENARIOS)"""
+    factors = [float(f) for f in os.getenv("BUDGET_SCENARIOS", "0.5,0.75,1,1.25,1.5,2").split(",") if f.strip()]
+    return sorted({round(budget * factor, 2) for factor in factors} | {budget})
+
+
+def traveler_scenarios(travelers: int) -> list:
+    return list(range(1, max(travelers, 4) + 1))
+
+
+class BudgetModel:
+    """Trip costs parsed once into (low, high) arrays and priced for many scenarios at once
+
+    Costs come from the plan as generated for the trip's own traveler count. For other
+    traveler counts, food and entry fees scale per person and hotels per room of two.
+    Transportation and miscellaneous stay a fixed share of the budget. A point estimate
+    is the midpoint of a range, as it always was. numpy is imported on first use, so it
+    stays off the cold-start path and shows up in /api/startup.
+    """
+
+    def __init__(self, travel_details: dict, hotels: list, itinerary: list, places: list):
+        np = lazy_import("numpy")
+        user_budget = travel_details.get("budget", 2000)
+        self.budget = parse_amount(user_budget, 2000.0)
+        # Echoed back as given, unless it was not a number (the extraction fallback uses "2000")
+        self.user_budget = user_budget if isinstance(user_budget, (int, float)) else self.budget
+        self.travelers = max(int(_number(travel_details.get("travelers", 2), 2)), 1)
+
+        self.hotels = [{"name": hotel.get("name"), "city": hotel.get("city")} for hotel in hotels]
+        self.hotel_costs = parse_costs(hotel.get("total_estimated", "0") for hotel in hotels)
+        self.food = parse_costs(day.get("estimated_cost", "0") for day in itinerary).sum(axis=0)
+        self.activities = parse_costs(place.get("entry_fee", "0") for place in places).sum(axis=0)
+
+        # City index of each hotel, 0..cities-1
+        if hotels:
+            _, self.hotel_city = np.unique([str(hotel.get("city")) for hotel in hotels], return_inverse=True)
+        else:
+            self.hotel_city = np.zeros(0, dtype=int)
+
+    def _cheapest_per_city(self) -> tuple:
+        """Per-city (low, high) of the hotel with the lowest midpoint, and that hotel's index"""
+        np = lazy_import("numpy")
+        # Sort by city, then by midpoint; the first hotel of each city is its cheapest
+        order = np.lexsort((self.hotel_costs.mean(axis=1), self.hotel_city))
+        cities = self.hotel_city[order]
+        first = np.r_[True, cities[1:] != cities[:-1]]
+        cheapest = order[first]
+        return self.hotel_costs[cheapest], cheapest
+
+    def accommodation_options(self) -> "np.ndarray":
+        """(H, 2) stay cost per hotel option: that hotel in its city, the cheapest one elsewhere"""
+        np = lazy_import("numpy")
+        if not len(self.hotel_costs):
+            return np.zeros((1, 2))
+        cheapest_costs, _ = self._cheapest_per_city()
+        return cheapest_costs.sum(axis=0) - cheapest_costs[self.hotel_city] + self.hotel_costs
+
+    def evaluate(self, budgets=None, travelers=None) -> dict:
+        """Totals for every hotel option x budget x traveler count, in one vectorized pass
+
+        total_low/total/total_high and within_budget are nested lists indexed
+        [hotel][budget][travelers] following the returned `budgets` and `travelers`.
+        """
+        np = lazy_import("numpy")
+        budgets = np.array(budgets if budgets is not None else budget_scenarios(self.budget), dtype=float)
+        travelers = np.array(travelers if travelers is not None else traveler_scenarios(self.travelers), dtype=float)
+
+        per_person = travelers / self.travelers
+        per_room = np.ceil(travelers / 2) / math.ceil(self.travelers / 2)
+
+        # (H, 2) -> (H, 1, T, 2); (2,) -> (1, 1, T, 2); (B,) -> (1, B, 1, 1)
+        accommodation = self.accommodation_options()[:, None, None, :] * per_room[None, None, :, None]
+        shared = (self.food + self.activities)[None, None, None, :] * per_person[None, None, :, None]
+        fixed = (budgets * (TRANSPORTATION_RATE + MISCELLANEOUS_RATE))[None, :, None, None]
+        totals = accommodation + shared + fixed
+
+        midpoint = totals.mean(axis=3)
+        return {
+            "hotels": self.hotels or [{"name": None, "city": None}],
+            "budgets": budgets.tolist(),
+            "travelers": travelers.astype(int).tolist(),
+            "total_low": np.round(totals[..., 0], 2).tolist(),
+            "total": np.round(midpoint, 2).tolist(),
+            "total_high": np.round(totals[..., 1], 2).tolist(),
+            "within_budget": (midpoint <= budgets[None, :, None]).tolist()
+        }
+
+    def components(self) -> dict:
+        """Parsed (low, high) inputs, for clients that reprice without another request"""
+        np = lazy_import("numpy")
+        return {
+            "base_budget": self.budget,
+            "base_travelers": self.travelers,
+            "rates": {"transportation": TRANSPORTATION_RATE, "miscellaneous": MISCELLANEOUS_RATE},
+            "hotels": np.round(self.hotel_costs, 2).tolist(),
+            "food": np.round(self.food, 2).tolist(),
+            "activities": np.round(self.activities, 2).tolist()
+        }
+
+    def breakdown(self) -> dict:
+        """Point estimate for the trip as planned: cheapest hotel in each city, midpoints"""
+        accommodation = float(self._cheapest_per_city()[0].mean(axis=1).sum()) if len(self.hotel_costs) else 0.0
+        food = float(self.food.mean())
+        activities = float(self.activities.mean())
+        transportation = self.budget * TRANSPORTATION_RATE
+        miscellaneous = self.budget * MISCELLANEOUS_RATE
+
+        total_estimated = accommodation + food + activities + transportation + miscellaneous
+        remaining = self.budget - total_estimated
+        return {
+            "accommodation": round(accommodation, 2),
+            "food": round(food, 2),
+            "activities": round(activities, 2),
+            "transportation": round(transportation, 2),
+            "miscellaneous": round(miscellaneous, 2),
+            "total_estimated": round(total_estimated, 2),
+            "user_budget": self.user_budget,
+            "remaining": round(remaining, 2),
+            "within_budget": bool(remaining >= 0)
+        }
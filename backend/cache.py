@@ -0,0 +1,264 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from deadline import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache"))
+
+
+def cache_key(*parts) -> str:
+    """Stable key for any JSON-serialisable combination of values"""
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class FileStore:
+    """Cache entries shared by every process on the host, one JSON file per key
+
+    Writes go to a temporary file that is renamed over the entry, so readers in other
+    processes see either the old or the new entry, never a partial one. Expiry uses
+    wall-clock time because it is compared across processes.
+    """
+
+    # Expired files are swept after this many writes from one process
+    SWEEP_EVERY = 256
+
+    def __init__(self, directory: str, ttl: float):
+        self.directory = directory
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> tuple:
+        """(found, value); a missing, expired or unreadable entry is not found"""
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return False, None
+        if entry.get("expires", 0) <= time.time():
+            return False, None
+        return True, entry.get("value")
+
+    def set(self, key: str, value):
+        path = self._path(key)
+        try:
+            payload = json.dumps({"expires": time.time() + self.ttl, "value": value}, ensure_ascii=False)
+        except (TypeError, ValueError):
+            # Not JSON-serialisable: stays in this process' memory only
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning("Cache write failed for %s: %s", path, e)
+            return
+
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % self.SWEEP_EVERY == 0
+        if sweep:
+            self.sweep()
+
+    def sweep(self):
+        """Delete expired entries"""
+        now = time.time()
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    if name.endswith(".tmp"):
+                        # Left behind by a process killed mid-write
+                        if os.path.getmtime(path) < now - 60:
+                            os.unlink(path)
+                        continue
+                    with open(path, encoding="utf-8") as f:
+                        expires = json.load(f).get("expires", 0)
+                    if expires <= now:
+                        os.unlink(path)
+                except (OSError, ValueError):
+                    continue
+
+    def count(self) -> int:
+        return sum(len(names) for _, _, names in os.walk(self.directory))
+
+
+class MemoCache:
+    """Thread-safe TTL/LRU memoization with single-flight
+
+    Concurrent callers asking for the same key while it is being computed wait
+    for the first caller's result instead of repeating the upstream call.
+    Exceptions are passed to the waiters but never cached, except DeadlineExceeded:
+    a computation cut short by its caller's deadline says nothing about the value,
+    so a waiter that still has time computes it itself. With a shared `store`,
+    a miss in memory is looked up there before computing, and computed values are
+    written there for the other worker processes.
+    """
+
+    def __init__(self, name: str, ttl: float = 3600, max_entries: int = 2048, store: FileStore | None = None):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.store = store
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+
+    def get_or_compute(self, key: str, compute, timeout: float | None = None):
+        """Cached value of `key`, computing it at most once at a time
+
+        `timeout` bounds how long this caller waits for another caller's computation
+        (usually the time left in its request); running out raises DeadlineExceeded.
+        """
+        wait_until = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+
+                future = self._inflight.get(key)
+                if future is not None:
+                    self.hits += 1
+                    owner = False
+                else:
+                    future = Future()
+                    self._inflight[key] = future
+                    self.misses += 1
+                    owner = True
+
+            if owner:
+                break
+            try:
+                return future.result(timeout=max(wait_until - time.monotonic(), 0) if wait_until is not None else None)
+            except TimeoutError:
+                raise DeadlineExceeded(f"Gave up waiting for a shared '{self.name}' result") from None
+            except DeadlineExceeded:
+                # The owner ran out of its own time; try again with ours
+                continue
+
+        try:
+            found, value = self.store.get(key) if self.store is not None else (False, None)
+            if found:
+                with self._lock:
+                    self.shared_hits += 1
+            else:
+                value = compute()
+                if self.store is not None:
+                    self.store.set(key, value)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        self._remember(key, value)
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        return value
+
+    def peek(self, key: str) -> tuple:
+        """(found, value) from memory or the shared store, without computing anything"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+
+        found, value = self.store.get(key) if self.store is not None else (False, None)
+        with self._lock:
+            if found:
+                self.shared_hits += 1
+            else:
+                self.misses += 1
+        if found:
+            self._remember(key, value)
+        return found, value
+
+    def put(self, key: str, value):
+        """Cache a value computed outside get_or_compute (e.g. a streamed completion)"""
+        self._remember(key, value)
+        if self.store is not None:
+            self.store.set(key, value)
+
+    def _remember(self, key: str, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                "name": self.name,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+            if self.store is not None:
+                stats["shared_hits"] = self.shared_hits
+        if self.store is not None:
+            stats["shared_entries"] = self.store.count()
+        return stats
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str) -> MemoCache:
+    """Return the process-wide cache for a namespace (tavily, images, llm, ...)
+
+    With CACHE_BACKEND=file the cache is backed by a FileStore under CACHE_DIR,
+    shared by every worker process on the host.
+    """
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            ttl = float(os.getenv("CACHE_TTL_SECONDS", "3600"))
+            store = None
+            if os.getenv("CACHE_BACKEND", "memory").lower() == "file":
+                store = FileStore(os.path.join(os.getenv("CACHE_DIR", CACHE_DIR), name), ttl)
+            cache = MemoCache(
+                name,
+                ttl=ttl,
+                max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "2048")),
+                store=store
+            )
+            _caches[name] = cache
+        return cache
+
+
+def all_caches() -> list:
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [cache.stats() for cache in caches]
@@ -0,0 +1,127 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose breaker is open"""
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker for a single upstream provider
+
+    closed    -> calls go through, consecutive failures are counted
+    open      -> calls are rejected until reset_timeout has passed
+    half_open -> a limited number of probe calls are let through; a success
+                 closes the breaker again, a failure re-opens it
+
+    A caller that is let through must report back with record_success,
+    record_failure or release. A probe that never reports back is written off
+    after reset_timeout, so a lost probe cannot keep the breaker half open.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+        self._probe_started_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def _refresh(self):
+        """Move from open to half_open once the reset timeout has passed, and re-arm
+        probes that never reported back (lock must be held)"""
+        now = time.monotonic()
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._half_open_calls = 0
+        elif (self._state == self.HALF_OPEN and self._half_open_calls
+              and now - self._probe_started_at >= self.reset_timeout):
+            logger.warning("⚡ Circuit '%s' probe never reported back, allowing a new one", self.name)
+            self._half_open_calls = 0
+
+    def allow_request(self) -> bool:
+        """Return True if a call may be attempted right now"""
+        with self._lock:
+            self._refresh()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+                self._half_open_calls += 1
+                self._probe_started_at = time.monotonic()
+                return True
+            return False
+
+    def release(self):
+        """Give back a call allowed by allow_request that reached no upstream, so it counts as neither outcome"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._half_open_calls:
+                self._half_open_calls -= 1
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._half_open_calls = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning("⚡ Circuit '%s' opened after %d failures", self.name, self._failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._half_open_calls = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            self._refresh()
+            return {
+                "name": self.name,
+                "state": self._state,
+                "failures": self._failures
+            }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Return the process-wide breaker for a provider, creating it on first use"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                name,
+                failure_threshold=int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30")),
+                half_open_max_calls=int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_CALLS", "1"))
+            )
+            _breakers[name] = breaker
+        return breaker
+
+
+def all_breakers() -> list:
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [breaker.snapshot() for breaker in breakers]
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+import metrics
+
+
+class DeadlineExceeded(Exception):
+    """Raised when there is no time left in the request budget"""
+
+
+class RequestCancelled(DeadlineExceeded):
+    """Raised when the client went away or the job was cancelled"""
+
+
+class Deadline:
+    """Per-request time budget passed down to every node, LLM call and HTTP call
+
+    Downstream timeouts are shrunk to whatever is left of the budget, and callers
+    that had to drop or degrade work record it so the response can be marked partial.
+    Cancelling the request (client disconnect, cancel endpoint) leaves no budget at
+    all, so every check that respects the deadline also stops cancelled work.
+    """
+
+    def __init__(self, seconds: float):
+        self.budget = seconds
+        self.expires_at = time.monotonic() + seconds
+        self._lock = threading.Lock()
+        self._degraded = []
+        self._cancelled = threading.Event()
+        self.cancel_reason = None
+        # profiling.Profile when this request is being profiled
+        self.profile = None
+
+    @classmethod
+    def from_request(cls, header_value: str | None = None) -> "Deadline":
+        """Build a deadline from the X-Request-Deadline header (seconds) or the configured default"""
+        default = float(os.getenv("PLAN_DEADLINE_SECONDS", "60"))
+        maximum = float(os.getenv("PLAN_MAX_DEADLINE_SECONDS", "120"))
+
+        seconds = default
+        if header_value:
+            try:
+                seconds = float(header_value)
+            except ValueError:
+                seconds = default
+
+        return cls(min(max(seconds, 1.0), maximum))
+
+    def remaining(self) -> float:
+        if self._cancelled.is_set():
+            return 0.0
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def cancel(self, reason: str = "cancelled"):
+        """Stop all remaining work for this request"""
+        if not self._cancelled.is_set():
+            self.cancel_reason = reason
+            self._cancelled.set()
+            metrics.increment("cancelled_requests")
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def raise_if_cancelled(self, work: str):
+        """Raise RequestCancelled, counting the skipped unit of work (nodes, llm_calls, http_calls)"""
+        if self._cancelled.is_set():
+            metrics.increment(f"cancelled_{work}")
+            raise RequestCancelled(f"Request cancelled ({self.cancel_reason})")
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def has_time_for(self, seconds: float) -> bool:
+        return self.remaining() >= seconds
+
+    def timeout(self, default: float | None = None) -> float:
+        """Timeout for a downstream call: the default capped to the remaining budget"""
+        remaining = self.remaining()
+        if self._cancelled.is_set():
+            raise RequestCancelled(f"Request cancelled ({self.cancel_reason})")
+        if remaining <= 0:
+            raise DeadlineExceeded(f"Request deadline of {self.budget:.1f}s exceeded")
+        return remaining if default is None else min(default, remaining)
+
+    def mark_degraded(self, what: str):
+        """Record that some work was skipped or replaced by fallback data"""
+        with self._lock:
+            if what not in self._degraded:
+                self._degraded.append(what)
+
+    @property
+    def degraded(self) -> list:
+        with self._lock:
+            return list(self._degraded)
@@ -0,0 +1,146 @@
+import difflib
+import json
+import os
+import re
+import threading
+import unicodedata
+
+import metrics
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.json")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation: 'Zürich, CH' -> 'zurich ch'"""
+    text = unicodedata.normalize("NFKD", str(text))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w]+", " ", text.lower())
+    return " ".join(text.split())
+
+
+class Gazetteer:
+    """Local index of canonical destinations loaded from the bundled gazetteer file
+
+    Maps free-text destinations from the LLM ("Tokyo, Japan", "tokyo", "Tokyo JP")
+    to a stable id with country and coordinates, so cache keys and search queries
+    are the same for every spelling of a place.
+    """
+
+    # Place names that are also everyday words, ignored when scanning free text
+    AMBIGUOUS_WORDS = {"nice", "split", "male"}
+
+    def __init__(self, path: str = GAZETTEER_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.entries = {entry["id"]: entry for entry in data["destinations"]}
+
+        # normalized country name, ISO code or alias ("uk", "usa", "texas") -> country codes it may mean
+        self._countries = {}
+        for entry in self.entries.values():
+            for name in (entry["country"], entry["country_code"]):
+                self._countries.setdefault(normalize(name), set()).add(entry["country_code"])
+        for code, aliases in data.get("countries", {}).items():
+            for alias in aliases:
+                self._countries.setdefault(normalize(alias), set()).add(code)
+
+        # normalized alias -> ids (a bare name can exist in more than one country)
+        self._aliases = {}
+        for entry in self.entries.values():
+            for alias in [entry["name"], *entry.get("aliases", [])]:
+                self._add_alias(normalize(alias), entry["id"])
+                self._add_alias(normalize(f"{alias} {entry['country']}"), entry["id"])
+                self._add_alias(normalize(f"{alias} {entry['country_code']}"), entry["id"])
+        self._alias_keys = list(self._aliases)
+
+    def _add_alias(self, alias: str, entry_id: str):
+        ids = self._aliases.setdefault(alias, [])
+        if entry_id not in ids:
+            ids.append(entry_id)
+
+    def _pick(self, ids: list, country_hint: str) -> dict | None:
+        """Choose between same-named places using the rest of the text, if any
+
+        A hint naming a known country or region rules out places elsewhere ("Paris, Texas"
+        is not Paris, France), leaving the destination unresolved rather than mapped to the
+        wrong city. An unknown hint ("Kansai") is ignored unless it would have to choose
+        between several same-named places.
+        """
+        if not country_hint:
+            return self.entries[ids[0]]
+        codes = self._countries.get(country_hint)
+        if codes:
+            matching = [entry_id for entry_id in ids if self.entries[entry_id]["country_code"] in codes]
+            return self.entries[matching[0]] if matching else None
+        return self.entries[ids[0]] if len(ids) == 1 else None
+
+    def lookup(self, text: str) -> dict | None:
+        """Resolve a free-text destination to its canonical entry, or None"""
+        if not text:
+            return None
+
+        full = normalize(text)
+        parts = [normalize(part) for part in str(text).split(",") if normalize(part)]
+        if not full or not parts:
+            return None
+        country_hint = parts[-1] if len(parts) > 1 else ""
+
+        # 1. The whole string or its first comma-separated part is a known alias
+        for candidate in (full, parts[0]):
+            if candidate in self._aliases:
+                return self._pick(self._aliases[candidate], country_hint)
+
+        # 2. Leading words of the first part ("tokyo metropolis area" -> "tokyo metropolis" -> "tokyo")
+        words = parts[0].split()
+        for size in range(len(words) - 1, 0, -1):
+            candidate = " ".join(words[:size])
+            if candidate in self._aliases:
+                return self._pick(self._aliases[candidate], country_hint)
+
+        # 3. Fuzzy match for typos ("kyotto", "barcelonna")
+        match = difflib.get_close_matches(parts[0], self._alias_keys, n=1, cutoff=0.85)
+        if match:
+            return self._pick(self._aliases[match[0]], country_hint)
+
+        return None
+
+    def find_in_text(self, text: str, limit: int = 3) -> list:
+        """Cheap scan of raw user text for known destinations, in order of appearance"""
+        words = normalize(text).split()
+        found = []
+        position = 0
+        while position < len(words) and len(found) < limit:
+            # Longest alias starting at this word wins ("new york city" over "new york")
+            for size in range(min(4, len(words) - position), 0, -1):
+                candidate = " ".join(words[position:position + size])
+                # Very short aliases ("la", "sf") are too ambiguous in free text
+                if len(candidate) < 3 or candidate in self.AMBIGUOUS_WORDS or candidate not in self._aliases:
+                    continue
+                entry = self.entries[self._aliases[candidate][0]]
+                if entry not in found:
+                    found.append(entry)
+                position += size - 1
+                break
+            position += 1
+        return found
+
+    def canonical_name(self, entry: dict) -> str:
+        return f"{entry['name']}, {entry['country']}"
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer()
+        return _gazetteer
+
+
+def resolve_destination(text: str) -> dict | None:
+    """Resolve a destination and count whether it resolved, for the hit-rate metric"""
+    entry = get_gazetteer().lookup(text)
+    metrics.increment("destinations_resolved" if entry else "destinations_unresolved")
+    return entry
@@ -1,12 +1,23 @@
+import logging
 import os
 import requests
 from urllib.parse import quote
 from dotenv import load_dotenv
+from cache import cache_key, get_cache
+from circuit_breaker import CircuitOpenError, get_breaker
+from deadline import Deadline, DeadlineExceeded
+from upstream import upstream_slot
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class GoogleAPIHelper:
     """Helper class for Google Custom Search API (Images) and Google Places API (Maps)"""
+
+    REQUEST_TIMEOUT = 10
+    # Below this much remaining request budget the fallback is used without calling Google
+    MIN_REQUEST_SECONDS = 1
     
     def __init__(self):
         # Google Custom Search API credentials
@@ -26,8 +37,12 @@ class GoogleAPIHelper:
         self.google_places_key = os.getenv("GOOGLE_PLACES_API_KEY", self.google_api_key)
         # https://console.cloud.google.com/
         # Enable Places API (or Places API (New)): in Cloud Console → APIs & Services → Library → search “Places API” → Enable.
+
+        # Process-wide breakers so a dead endpoint is skipped instead of waiting on every timeout
+        self.search_breaker = get_breaker("google_search")
+        self.places_breaker = get_breaker("google_places")
     
-    def search_images(self, query: str, num_results: int = 1) -> list:
+    def search_images(self, query: str, num_results: int = 1, deadline: Deadline | None = None) -> list:
         """
         Get images using Google Custom Search API
         
@@ -38,52 +53,83 @@ class GoogleAPIHelper:
         Setup: https://developers.google.com/custom-search/v1/overview
         """
         if not self.google_api_key or not self.google_search_engine_id:
-            print("⚠️ Google API credentials not found, using placeholder")
+            logger.debug("⚠️ Google API credentials not found, using placeholder")
             return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
         
+        if deadline is not None:
+            deadline.raise_if_cancelled("http_calls")
+        
+        if deadline is not None and not deadline.has_time_for(self.MIN_REQUEST_SECONDS):
+            deadline.mark_degraded("images")
+            return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
+        
+        timeout = deadline.timeout(self.REQUEST_TIMEOUT) if deadline is not None else self.REQUEST_TIMEOUT
         try:
-            url = "https://www.googleapis.com/customsearch/v1"
-            params = {
-                'key': self.google_api_key,
-                'cx': self.google_search_engine_id,
-                'q': query,
-                'searchType': 'image',
-                'num': num_results,
-                'imgSize': 'large',
-                'safe': 'active'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                results = response.json()
-                images = []
-                
-                for item in results.get('items', []):
-                    img_url = item.get('link', '')
-                    if img_url:
-                        images.append(img_url)
-                
-                if images:
-                    print(f"✅ Found Google image for: {query}")
-                    return images
-                else:
-                    print(f"No Google images found for: {query}")
-                    return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
-            
-            elif response.status_code == 403:
-                print(f"❌ Google API: Access denied (check billing/quota)")
-                return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
-            
-            else:
-                print(f"❌ Google API error {response.status_code}")
-                return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
-                
+            images = get_cache("images").get_or_compute(
+                cache_key("google", query, num_results),
+                lambda: self._fetch_google_images(query, num_results, timeout),
+                timeout=deadline.remaining() if deadline is not None else None
+            )
+        except CircuitOpenError:
+            return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
         except Exception as e:
-            print(f"Google Custom Search error: {e}")
+            if deadline is not None and isinstance(e, DeadlineExceeded):
+                deadline.mark_degraded("images")
+            logger.warning("Google Custom Search error: %s", e)
             return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
+        
+        if images:
+            logger.debug("✅ Found Google image for: %s", query)
+            return images
+        
+        logger.debug("No Google images found for: %s", query)
+        return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
     
-    def get_place_details(self, place_name: str, city: str = "") -> dict:
+    def _fetch_google_images(self, query: str, num_results: int, timeout: float) -> list:
+        """Call Custom Search and record the outcome on the breaker; raises on failure so errors are never cached"""
+        # Consulted on a cache miss only, so cached results are served while the breaker is open
+        if not self.search_breaker.allow_request():
+            raise CircuitOpenError("google_search")
+        
+        url = "https://www.googleapis.com/customsearch/v1"
+        params = {
+            'key': self.google_api_key,
+            'cx': self.google_search_engine_id,
+            'q': query,
+            'searchType': 'image',
+            'num': num_results,
+            'imgSize': 'large',
+            'safe': 'active'
+        }
+        
+        try:
+            with upstream_slot("google"):
+                response = requests.get(url, params=params, timeout=timeout)
+            
+            if response.status_code == 403:
+                raise requests.HTTPError("Google API: Access denied (check billing/quota)")
+            if response.status_code != 200:
+                raise requests.HTTPError(f"Google API error {response.status_code}")
+        except Exception as e:
+            # A timeout we shortened to fit the deadline says nothing about Google's health,
+            # but a half-open probe slot it took must still be given back
+            if timeout < self.REQUEST_TIMEOUT and isinstance(e, requests.Timeout):
+                self.search_breaker.release()
+                # Not cached and not passed on as a failure: callers waiting on this call retry
+                raise DeadlineExceeded(f"Google Custom Search call cut short by the request deadline ({timeout:.1f}s)") from e
+            self.search_breaker.record_failure()
+            raise
+        
+        self.search_breaker.record_success()
+        
+        images = []
+        for item in response.json().get('items', []):
+            img_url = item.get('link', '')
+            if img_url:
+                images.append(img_url)
+        return images
+    
+    def get_place_details(self, place_name: str, city: str = "", deadline: Deadline | None = None) -> dict:
         """
         Get exact place details using Google Places API (Text Search)
         
@@ -103,62 +149,89 @@ class GoogleAPIHelper:
         Setup: https://developers.google.com/maps/documentation/places/web-service/overview
         """
         if not self.google_places_key:
-            print("⚠️ Google Places API key not found")
+            logger.debug("⚠️ Google Places API key not found")
+            return self._fallback_place_data(place_name, city)
+        
+        if deadline is not None:
+            deadline.raise_if_cancelled("http_calls")
+        
+        if deadline is not None and not deadline.has_time_for(self.MIN_REQUEST_SECONDS):
+            deadline.mark_degraded("place_details")
             return self._fallback_place_data(place_name, city)
         
+        timeout = deadline.timeout(self.REQUEST_TIMEOUT) if deadline is not None else self.REQUEST_TIMEOUT
+        query = f"{place_name}, {city}".strip(", ")
         try:
-            # Step 1: Text Search to find the place
-            search_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-            query = f"{place_name}, {city}".strip(", ")
-            
-            params = {
-                'key': self.google_places_key,
-                'query': query,
-                'fields': 'place_id,name,formatted_address,geometry,rating'
-            }
-            
-            response = requests.get(search_url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                results = response.json()
-                
-                if results.get('results'):
-                    # Get first (most relevant) result
-                    place = results['results'][0]
-                    place_id = place.get('place_id', '')
-                    
-                    # Extract data
-                    location = place.get('geometry', {}).get('location', {})
-                    
-                    place_data = {
-                        'place_id': place_id,
-                        'name': place.get('name', place_name),
-                        'formatted_address': place.get('formatted_address', ''),
-                        'location': {
-                            'lat': location.get('lat', 0),
-                            'lng': location.get('lng', 0)
-                        },
-                        'rating': place.get('rating', 0),
-                        'maps_url': self._generate_maps_url_from_place_id(place_id) if place_id else self._fallback_maps_url(place_name, city)
-                    }
-                    
-                    print(f"✅ Found exact location for: {place_name}")
-                    return place_data
-                else:
-                    print(f"⚠️ No results found for: {query}")
-                    return self._fallback_place_data(place_name, city)
-            
-            elif response.status_code == 403:
-                print(f"❌ Google Places API: Access denied (check billing)")
-                return self._fallback_place_data(place_name, city)
-            
-            else:
-                print(f"❌ Google Places API error {response.status_code}")
-                return self._fallback_place_data(place_name, city)
-                
+            place = get_cache("geocode").get_or_compute(
+                cache_key("google_places", query),
+                lambda: self._fetch_place(query, timeout),
+                timeout=deadline.remaining() if deadline is not None else None
+            )
+        except CircuitOpenError:
+            return self._fallback_place_data(place_name, city)
         except Exception as e:
-            print(f"Google Places API error: {e}")
+            if deadline is not None and isinstance(e, DeadlineExceeded):
+                deadline.mark_degraded("place_details")
+            logger.warning("Google Places API error: %s", e)
+            return self._fallback_place_data(place_name, city)
+        
+        if not place:
+            logger.debug("⚠️ No results found for: %s", query)
             return self._fallback_place_data(place_name, city)
+        
+        place_id = place.get('place_id', '')
+        
+        # Extract data
+        location = place.get('geometry', {}).get('location', {})
+        
+        place_data = {
+            'place_id': place_id,
+            'name': place.get('name', place_name),
+            'formatted_address': place.get('formatted_address', ''),
+            'location': {
+                'lat': location.get('lat', 0),
+                'lng': location.get('lng', 0)
+            },
+            'rating': place.get('rating', 0),
+            'maps_url': self._generate_maps_url_from_place_id(place_id) if place_id else self._fallback_maps_url(place_name, city)
+        }
+        
+        logger.debug("✅ Found exact location for: %s", place_name)
+        return place_data
+    
+    def _fetch_place(self, query: str, timeout: float) -> dict | None:
+        """Text Search for the most relevant place, recording the outcome on the breaker"""
+        if not self.places_breaker.allow_request():
+            raise CircuitOpenError("google_places")
+        
+        search_url = "https://maps.googleapis.com/maps/api/place/textsearch/json"
+        params = {
+            'key': self.google_places_key,
+            'query': query,
+            'fields': 'place_id,name,formatted_address,geometry,rating'
+        }
+        
+        try:
+            with upstream_slot("google"):
+                response = requests.get(search_url, params=params, timeout=timeout)
+            
+            if response.status_code == 403:
+                raise requests.HTTPError("Google Places API: Access denied (check billing)")
+            if response.status_code != 200:
+                raise requests.HTTPError(f"Google Places API error {response.status_code}")
+        except Exception as e:
+            if timeout < self.REQUEST_TIMEOUT and isinstance(e, requests.Timeout):
+                self.places_breaker.release()
+                # Not cached and not passed on as a failure: callers waiting on this call retry
+                raise DeadlineExceeded(f"Google Places call cut short by the request deadline ({timeout:.1f}s)") from e
+            self.places_breaker.record_failure()
+            raise
+        
+        self.places_breaker.record_success()
+        
+        # First (most relevant) result, or None when nothing matched
+        results = response.json().get('results', [])
+        return results[0] if results else None
     
     def _generate_maps_url_from_place_id(self, place_id: str) -> str:
         """Generate exact Google Maps URL from Place ID"""
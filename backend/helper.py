@@ -1,8 +1,13 @@
+import logging
 import os
 import requests
 from urllib.parse import quote
 from dotenv import load_dotenv
 import urllib3
+from cache import cache_key, get_cache
+from circuit_breaker import CircuitOpenError, get_breaker
+from deadline import Deadline, DeadlineExceeded
+from upstream import upstream_slot
 
 # Disable SSL warning
 
@@ -10,55 +15,97 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 class Helper:
     """Helper class for images and map url"""
 
+    REQUEST_TIMEOUT = 10
+    # Below this much remaining request budget the placeholder is used without calling Pexels
+    MIN_REQUEST_SECONDS = 1
+
     def __init__(self):
         self.pexel_api_key = os.getenv("PEXELS_API_KEY")
+        self.pexels_breaker = get_breaker("pexels")
 
-    def search_images(self, query:str, num_results:int = 1) -> list:
+    def search_images(self, query:str, num_results:int = 1, deadline: Deadline | None = None) -> list:
         if not (self.pexel_api_key):
             return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
 
+        if deadline is not None:
+            deadline.raise_if_cancelled("http_calls")
+
+        if deadline is not None and not deadline.has_time_for(self.MIN_REQUEST_SECONDS):
+            deadline.mark_degraded("images")
+            return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
+
+        timeout = deadline.timeout(self.REQUEST_TIMEOUT) if deadline is not None else self.REQUEST_TIMEOUT
         try:
-            url = "https://api.pexels.com/v1/search"
-            headers = {
-                'Authorization' : self.pexel_api_key.strip()
-            }
-            params = {
-                'query':query,
-                'per_page':num_results,
-                'orientation':'landscape'
-            }
-
-            response = requests.get(url, headers=headers, params=params, timeout=10, verify=False)
-
-            if(response.status_code == 200):
-                results = response.json()
-                images = []
-
-                for photo in results.get('photos',[]):
-
-                    image_url = photo.get('src', {}).get('large','')
-                    if image_url:
-                        images.append(image_url)
-
-                if images:
-                    print(f"Found the image for : {query}")
-                    return images
-                
-                else:
-                    print(f"No pexel image found, using unsplash for :{query}")
-                    return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
-                
-            else:
-                print(f"Pexel API error {response.status_code}, using unsplash")
-                return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
-            
+            # Identical queries (same place, same destination) share one Pexels call
+            images = get_cache("images").get_or_compute(
+                cache_key("pexels", query, num_results),
+                lambda: self._fetch_pexels_images(query, num_results, timeout),
+                timeout=deadline.remaining() if deadline is not None else None
+            )
+        except CircuitOpenError:
+            return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
         except Exception as e:
-            print(f"Pexel error : {e}, using Unsplash now")
+            if deadline is not None and isinstance(e, DeadlineExceeded):
+                deadline.mark_degraded("images")
+            logger.warning("Pexel error : %s, using Unsplash now", e)
             return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
-        
+
+        if images:
+            logger.debug("Found the image for : %s", query)
+            return images
+
+        logger.debug("No pexel image found, using unsplash for :%s", query)
+        return [f"https://source.unsplash.com/800x600/?{quote(query)}"]
+
+    def _fetch_pexels_images(self, query:str, num_results:int, timeout:float) -> list:
+        """Call Pexels and record the outcome on the breaker; raises on failure so errors are never cached
+
+        The breaker is only consulted here, on a cache miss, so cached results are served
+        while it is open and every probe it lets through reports back.
+        """
+        if not self.pexels_breaker.allow_request():
+            raise CircuitOpenError("pexels")
+
+        url = "https://api.pexels.com/v1/search"
+        headers = {
+            'Authorization' : self.pexel_api_key.strip()
+        }
+        params = {
+            'query':query,
+            'per_page':num_results,
+            'orientation':'landscape'
+        }
+
+        try:
+            with upstream_slot("images"):
+                response = requests.get(url, headers=headers, params=params, timeout=timeout, verify=False)
+
+            if(response.status_code != 200):
+                raise requests.HTTPError(f"Pexel API error {response.status_code}")
+        except Exception as e:
+            # A timeout we shortened to fit the deadline says nothing about Pexels' health,
+            # but a half-open probe slot it took must still be given back
+            if timeout < self.REQUEST_TIMEOUT and isinstance(e, requests.Timeout):
+                self.pexels_breaker.release()
+                # Not cached and not passed on as a failure: callers waiting on this call retry
+                raise DeadlineExceeded(f"Pexels call cut short by the request deadline ({timeout:.1f}s)") from e
+            self.pexels_breaker.record_failure()
+            raise
+
+        self.pexels_breaker.record_success()
+
+        images = []
+        for photo in response.json().get('photos',[]):
+            image_url = photo.get('src', {}).get('large','')
+            if image_url:
+                images.append(image_url)
+        return images
+
     def get_maps_link(self, place_name:str, city:str = "") -> str:
         query = f"{place_name},{city}".strip(",")
         encoded_query = quote(query)
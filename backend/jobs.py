@@ -0,0 +1,192 @@
+import contextvars
+import hashlib
+import logging
+import os
+import select
+import socket
+import tempfile
+import threading
+import time
+
+from cache import CACHE_DIR
+from deadline import Deadline
+
+logger = logging.getLogger(__name__)
+
+
+def shared_job_directory() -> str | None:
+    """Where workers publish their running jobs when the cache is shared (CACHE_BACKEND=file)"""
+    if os.getenv("CACHE_BACKEND", "memory").lower() != "file":
+        return None
+    return os.path.join(os.getenv("CACHE_DIR", CACHE_DIR), "jobs")
+
+
+def _write_atomic(path: str, text: str):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobRegistry:
+    """Running plan requests by job id, so they can be cancelled from another request
+
+    With a directory (shared by the workers of serve.py), every running job also has a
+    <job>.running file holding its worker's pid. A cancel that lands on another worker
+    writes a <job>.<pid>.cancel marker, which the owning worker picks up within
+    poll_interval.
+    """
+
+    def __init__(self, directory: str | None = None, poll_interval: float = 0.5):
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self._watcher = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_id: str, suffix: str) -> str:
+        # Job ids come from clients; hashing keeps them safe as file names
+        return os.path.join(self.directory, hashlib.sha1(job_id.encode("utf-8")).hexdigest() + suffix)
+
+    def _owner(self, job_id: str) -> int | None:
+        """Pid of the live worker running this job, if any"""
+        try:
+            with open(self._path(job_id, ".running"), encoding="utf-8") as f:
+                pid = int(f.read())
+        except (OSError, ValueError):
+            return None
+        return pid if _is_alive(pid) else None
+
+    def _request_cancel(self, job_id: str, pid: int, reason: str):
+        try:
+            _write_atomic(self._path(job_id, f".{pid}.cancel"), reason)
+        except OSError as e:
+            logger.warning("Could not write cancel marker for job %s: %s", job_id, e)
+
+    def register(self, job_id: str, deadline: Deadline):
+        """Track a job; re-submitting an id that is still running cancels the older request"""
+        with self._lock:
+            previous = self._jobs.get(job_id)
+            self._jobs[job_id] = deadline
+        if previous is not None:
+            previous.cancel("superseded")
+
+        if self.directory is None:
+            return
+        pid = os.getpid()
+        owner = self._owner(job_id)
+        if owner is not None and owner != pid:
+            self._request_cancel(job_id, owner, "superseded")
+        try:
+            # A marker left over from an earlier job with this id must not cancel this one
+            os.remove(self._path(job_id, f".{pid}.cancel"))
+        except FileNotFoundError:
+            pass
+        try:
+            _write_atomic(self._path(job_id, ".running"), str(pid))
+        except OSError as e:
+            logger.warning("Could not publish job %s: %s", job_id, e)
+        self._start_watcher()
+
+    def unregister(self, job_id: str, deadline: Deadline):
+        with self._lock:
+            if self._jobs.get(job_id) is not deadline:
+                return
+            del self._jobs[job_id]
+        if self.directory is not None and self._owner(job_id) == os.getpid():
+            try:
+                os.remove(self._path(job_id, ".running"))
+            except OSError:
+                pass
+
+    def cancel(self, job_id: str, reason: str = "cancel requested") -> bool:
+        """Cancel a job running here, or ask the worker running it; False if it is not running"""
+        with self._lock:
+            deadline = self._jobs.get(job_id)
+        if deadline is not None:
+            deadline.cancel(reason)
+            return True
+        if self.directory is None:
+            return False
+        owner = self._owner(job_id)
+        if owner is None or owner == os.getpid():
+            return False
+        self._request_cancel(job_id, owner, reason)
+        return True
+
+    def _start_watcher(self):
+        with self._lock:
+            if self._watcher is None:
+                self._watcher = threading.Thread(target=self._watch, name="job-cancel-watch", daemon=True)
+                self._watcher.start()
+
+    def _watch(self):
+        """Apply cancel markers written by other workers to the jobs running here"""
+        pid = os.getpid()
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                running = list(self._jobs.items())
+            for job_id, deadline in running:
+                marker = self._path(job_id, f".{pid}.cancel")
+                try:
+                    with open(marker, encoding="utf-8") as f:
+                        reason = f.read() or "cancel requested"
+                    os.remove(marker)
+                except OSError:
+                    continue
+                logger.info("🛑 Job %s cancelled from another worker (%s)", job_id, reason)
+                deadline.cancel(reason)
+
+
+def client_socket(environ: dict) -> socket.socket | None:
+    """The raw client connection, when the WSGI server exposes it"""
+    return environ.get("werkzeug.socket") or environ.get("gunicorn.socket")
+
+
+def _is_disconnected(sock: socket.socket) -> bool:
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+        # A readable socket with nothing to read has been closed by the client
+        return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b""
+    except (OSError, ValueError):
+        return True
+
+
+def watch_disconnect(environ: dict, deadline: Deadline, interval: float = 0.5) -> threading.Event:
+    """Cancel the deadline if the client closes the connection
+
+    Returns an event the caller sets once the response is ready, which stops the watcher.
+    When the server does not expose the socket, nothing is watched.
+    """
+    done = threading.Event()
+    sock = client_socket(environ)
+    if sock is None:
+        return done
+
+    def watch():
+        while not done.wait(interval):
+            if _is_disconnected(sock):
+                logger.info("🔌 Client disconnected, cancelling request")
+                deadline.cancel("client disconnected")
+                return
+
+    # Run in a copy of the request's context so the log record carries its request id
+    threading.Thread(target=contextvars.copy_context().run, args=(watch,), name="disconnect-watch", daemon=True).start()
+    return done
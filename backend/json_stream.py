@@ -0,0 +1,68 @@
+import json
+
+
+class JsonArrayStream:
+    """Incrementally split a streamed top-level JSON array into its elements
+
+    Text before the opening '[' (such as a ```json fence) and after the closing ']'
+    is ignored. feed() returns (raw_text, value) for every element completed by the
+    chunk. Once an element fails to parse, `failed` is set and nothing more is returned;
+    the caller's full-text parse will then fail the same way.
+    """
+
+    def __init__(self):
+        self.failed = False
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._buffer = []
+
+    def feed(self, chunk: str) -> list:
+        items = []
+        for ch in chunk:
+            if self._done or self.failed:
+                break
+
+            if not self._started:
+                self._started = ch == "["
+                continue
+
+            if self._in_string:
+                self._buffer.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "[{":
+                self._depth += 1
+            elif ch in "]}":
+                if self._depth == 0:
+                    # Closing bracket of the top-level array
+                    self._flush(items)
+                    self._done = True
+                    continue
+                self._depth -= 1
+            elif ch == "," and self._depth == 0:
+                self._flush(items)
+                continue
+
+            self._buffer.append(ch)
+        return items
+
+    def _flush(self, items: list):
+        raw = "".join(self._buffer).strip()
+        self._buffer = []
+        if not raw:
+            return
+        try:
+            items.append((raw, json.loads(raw)))
+        except json.JSONDecodeError:
+            self.failed = True
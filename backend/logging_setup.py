@@ -0,0 +1,161 @@
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import uuid
+from contextlib import contextmanager
+
+# Id of the plan request (or batch item) being worked on by the current thread
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+_listener = None
+_configure_lock = threading.Lock()
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp every record with the current request id"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, for log shipping"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        # Records from the queue carry the traceback as exc_text (see _QueueHandler)
+        exc_text = record.exc_text or (self.formatException(record.exc_info) if record.exc_info else None)
+        if exc_text:
+            entry["exc_info"] = exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+_traceback_formatter = logging.Formatter()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves formatting to the listener's formatter
+
+    The stock prepare() formats the whole record, traceback included, into the
+    message. Here only the message arguments are merged in the calling thread, and
+    the traceback is kept apart as exc_text, so the JSON output has it as exc_info.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+        # Tracebacks hold frames; only their text crosses the queue
+        record.exc_info = None
+        return record
+
+
+def parse_levels(value: str) -> dict:
+    """LOG_LEVELS like 'workflow=DEBUG,agents=WARNING' -> {'workflow': 'DEBUG', 'agents': 'WARNING'}"""
+    levels = {}
+    for part in value.split(","):
+        name, _, level = part.strip().partition("=")
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging():
+    """Route all logging through a queue so request threads never block on stderr
+
+    Records are stamped with the request id and enqueued by the calling thread; a single
+    listener thread formats and writes them. Safe to call more than once.
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+
+        output = logging.StreamHandler(sys.stderr)
+        if os.getenv("LOG_FORMAT", "text").lower() == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+
+        log_queue = queue.SimpleQueue()
+        handler = _QueueHandler(log_queue)
+        handler.addFilter(RequestIdFilter())
+
+        root = logging.getLogger()
+        root.handlers = [handler]
+        root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        for name, level in parse_levels(os.getenv("LOG_LEVELS", "")).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def _after_fork_in_child():
+    # The listener thread does not survive fork, so a forked worker configures its own
+    global _listener
+    _listener = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+@contextmanager
+def request_context(request_id: str | None = None):
+    """Bind a request id to log records emitted by this thread (and work submitted with in_context)"""
+    # Client-supplied ids are capped so they cannot flood the log lines
+    token = request_id_var.set((request_id or uuid.uuid4().hex[:12])[:64])
+    try:
+        yield request_id_var.get()
+    finally:
+        request_id_var.reset(token)
+
+
+def in_context(executor, fn, *args):
+    """executor.submit that carries the caller's request id into the worker thread"""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def truncate(value, limit: int | None = None) -> str:
+    """Shorten a payload for logging; LOG_PAYLOAD_CHARS=0 disables truncation"""
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    if limit is None:
+        limit = int(os.getenv("LOG_PAYLOAD_CHARS", "500"))
+    if limit and len(text) > limit:
+        return f"{text[:limit]}... ({len(text)} chars)"
+    return text
+
+
+def log_payload(logger: logging.Logger, label: str, payload):
+    """Log a raw prompt or response at DEBUG, only in payload debug mode
+
+    Off unless LOG_PAYLOADS=1; then sampled by LOG_PAYLOAD_SAMPLE_RATE and truncated,
+    so no formatting work is done on the hot path by default.
+    """
+    if os.getenv("LOG_PAYLOADS", "").lower() not in ("1", "true", "yes"):
+        return
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
+    if random.random() >= float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "1")):
+        return
+    logger.debug("%s: %s", label, truncate(payload))
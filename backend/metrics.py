@@ -0,0 +1,16 @@
+import threading
+from collections import Counter
+
+_counters = Counter()
+_lock = threading.Lock()
+
+
+def increment(name: str, amount: int = 1):
+    """Bump a process-wide counter"""
+    with _lock:
+        _counters[name] += amount
+
+
+def snapshot() -> dict:
+    with _lock:
+        return dict(_counters)
@@ -0,0 +1,258 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+PLAN_STORE_PATH = os.getenv(
+    "PLAN_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "plan_store.db")
+)
+
+# Plan fields made of items that repeat across plans; each item is stored once
+COMPONENT_KEYS = ("places", "restaurants", "hotels", "itinerary")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    hash TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    data BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS plans (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    manifest BLOB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS plans_created ON plans (created_at);
+"""
+
+# SQLite's limit on bound parameters is 999 on older builds
+_BATCH = 500
+
+
+def canonical_json(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def content_hash(value) -> str:
+    """Stable id of a JSON value: the same item always gets the same hash"""
+    return hashlib.sha256(canonical_json(value).encode("utf-8")).hexdigest()
+
+
+def _compress(value) -> bytes:
+    return zlib.compress(canonical_json(value).encode("utf-8"), 6)
+
+
+def _decompress(blob: bytes):
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class PlanStore:
+    """Content-addressed SQLite store of generated plans
+
+    Every place, restaurant, hotel and itinerary day is stored once, zlib-compressed,
+    under the hash of its content. A plan is a small compressed manifest of its
+    remaining fields plus the hashes of its components, so storage grows with the
+    number of distinct items rather than with the number of plans.
+    """
+
+    def __init__(self, path: str = PLAN_STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+
+        if path == ":memory:":
+            # Every thread has its own connection, so they must all open the same named
+            # in-memory database
+            self._uri = f"file:plan-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        else:
+            self._uri = None
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        # A shared in-memory database lives as long as one connection to it is open
+        self._keep_alive = connection if self._uri is not None else None
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside the writer"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self._uri is not None:
+                connection = sqlite3.connect(self._uri, timeout=10, uri=True)
+            else:
+                connection = sqlite3.connect(self.path, timeout=10)
+            if self._uri is None:
+                connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def save(self, plan: dict) -> str:
+        """Store a plan and return its id; components already stored are only referenced"""
+        now = time.time()
+        refs = {}
+        objects = {}
+        for key in COMPONENT_KEYS:
+            refs[key] = []
+            for item in plan.get(key) or []:
+                item_hash = content_hash(item)
+                refs[key].append(item_hash)
+                objects[item_hash] = (key, item)
+
+        manifest = {
+            "fields": {key: value for key, value in plan.items() if key not in COMPONENT_KEYS},
+            "refs": refs
+        }
+        plan_id = uuid.uuid4().hex
+
+        connection = self._connection()
+        with connection:
+            new = 0
+            for item_hash, (kind, item) in objects.items():
+                raw = canonical_json(item).encode("utf-8")
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO objects (hash, kind, data, size, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (item_hash, kind, zlib.compress(raw, 6), len(raw), now)
+                )
+                new += cursor.rowcount
+            connection.execute(
+                "INSERT INTO plans (id, created_at, manifest) VALUES (?, ?, ?)",
+                (plan_id, now, _compress(manifest))
+            )
+
+        metrics.increment("plan_objects_new", new)
+        metrics.increment("plan_objects_reused", len(objects) - new)
+        return plan_id
+
+    def _fetch_objects(self, hashes, cache: dict | None = None) -> dict:
+        """hash -> decoded object, in as few queries as possible"""
+        found = {}
+        missing = []
+        for item_hash in dict.fromkeys(hashes):
+            if cache is not None and item_hash in cache:
+                found[item_hash] = cache[item_hash]
+            else:
+                missing.append(item_hash)
+
+        connection = self._connection()
+        for start in range(0, len(missing), _BATCH):
+            batch = missing[start:start + _BATCH]
+            rows = connection.execute(
+                f"SELECT hash, data FROM objects WHERE hash IN ({','.join('?' * len(batch))})", batch
+            )
+            for item_hash, blob in rows:
+                found[item_hash] = _decompress(blob)
+                if cache is not None:
+                    cache[item_hash] = found[item_hash]
+        return found
+
+    def _assemble(self, plan_id: str, created_at: float, manifest_blob: bytes, cache: dict | None = None) -> dict:
+        manifest = _decompress(manifest_blob)
+        hashes = [item_hash for refs in manifest["refs"].values() for item_hash in refs]
+        objects = self._fetch_objects(hashes, cache)
+
+        plan = {"plan_id": plan_id, "created_at": created_at, **manifest["fields"]}
+        for key, refs in manifest["refs"].items():
+            plan[key] = [objects[item_hash] for item_hash in refs if item_hash in objects]
+        return plan
+
+    def load(self, plan_id: str) -> dict | None:
+        """Reassemble a stored plan, or None"""
+        row = self._connection().execute(
+            "SELECT id, created_at, manifest FROM plans WHERE id = ?", (plan_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return self._assemble(*row)
+
+    def get_object(self, item_hash: str) -> dict | None:
+        """A single stored component (place, restaurant, hotel or itinerary day) by hash"""
+        row = self._connection().execute(
+            "SELECT kind, data FROM objects WHERE hash = ?", (item_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"kind": row[0], "item": _decompress(row[1])}
+
+    def export(self, since: float = 0, cache_size: int = 4096):
+        """Yield every plan created after `since`, oldest first, one at a time
+
+        Plans are read with a cursor and reassembled one by one; decoded components are
+        kept in a bounded LRU, since the same items repeat across plans.
+        """
+        cache = _LRU(cache_size)
+        rows = self._connection().execute(
+            "SELECT id, created_at, manifest FROM plans WHERE created_at > ? ORDER BY created_at", (since,)
+        )
+        for row in rows:
+            yield self._assemble(*row, cache=cache)
+
+    def stats(self) -> dict:
+        connection = self._connection()
+        plans = connection.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(manifest)), 0) FROM plans").fetchone()
+        objects = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(data)), 0) FROM objects"
+        ).fetchone()
+        return {
+            "plans": plans[0],
+            "objects": objects[0],
+            "object_bytes_raw": objects[1],
+            "stored_bytes": plans[1] + objects[2]
+        }
+
+
+class _LRU(OrderedDict):
+    """Dict that forgets its least recently used entries beyond max_size"""
+
+    def __init__(self, max_size: int):
+        super().__init__()
+        self.max_size = max_size
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        if len(self) > self.max_size:
+            self.popitem(last=False)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def plan_store_enabled() -> bool:
+    return os.getenv("PLAN_STORE_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def get_plan_store() -> PlanStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PlanStore()
+        return _store
+
+
+def save_plan(plan: dict) -> str | None:
+    """Persist a finished plan, returning its id; None when disabled or the store failed"""
+    if not plan_store_enabled():
+        return None
+    try:
+        return get_plan_store().save(plan)
+    except sqlite3.Error as e:
+        logger.warning("Plan store write error: %s", e)
+        return None
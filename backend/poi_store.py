@@ -0,0 +1,238 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from gazetteer import normalize
+
+POI_STORE_PATH = os.getenv(
+    "POI_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "poi_store.db")
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pois (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    destination_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    category TEXT NOT NULL DEFAULT '',
+    cuisine TEXT NOT NULL DEFAULT '',
+    budget_level TEXT NOT NULL DEFAULT '',
+    rating REAL NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (kind, destination_key, name_key)
+);
+
+CREATE INDEX IF NOT EXISTS pois_lookup ON pois (kind, destination_key, updated_at);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS pois_fts USING fts5(
+    name, category, cuisine,
+    content='pois', content_rowid='id', tokenize='porter unicode61'
+);
+
+CREATE TRIGGER IF NOT EXISTS pois_ai AFTER INSERT ON pois BEGIN
+    INSERT INTO pois_fts (rowid, name, category, cuisine) VALUES (new.id, new.name, new.category, new.cuisine);
+END;
+CREATE TRIGGER IF NOT EXISTS pois_ad AFTER DELETE ON pois BEGIN
+    INSERT INTO pois_fts (pois_fts, rowid, name, category, cuisine) VALUES ('delete', old.id, old.name, old.category, old.cuisine);
+END;
+CREATE TRIGGER IF NOT EXISTS pois_au AFTER UPDATE ON pois BEGIN
+    INSERT INTO pois_fts (pois_fts, rowid, name, category, cuisine) VALUES ('delete', old.id, old.name, old.category, old.cuisine);
+    INSERT INTO pois_fts (rowid, name, category, cuisine) VALUES (new.id, new.name, new.category, new.cuisine);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS pois_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng);
+"""
+
+
+def destination_key(travel_details: dict) -> str:
+    """Gazetteer id when the destination resolved, normalized text otherwise"""
+    return travel_details.get("destination_id") or normalize(travel_details.get("destination", ""))
+
+
+def trip_budget_level(travel_details: dict) -> str:
+    """Budget/Mid-range/Luxury from the budget per traveler per day"""
+    try:
+        budget = float(travel_details.get("budget", 2000))
+        per_day = budget / max(int(travel_details.get("travelers", 2)), 1) / max(int(travel_details.get("duration", 7)), 1)
+    except (TypeError, ValueError):
+        return "Mid-range"
+    if per_day < 100:
+        return "Budget"
+    if per_day < 300:
+        return "Mid-range"
+    return "Luxury"
+
+
+def item_budget_level(kind: str, item: dict) -> str:
+    """Map an item's own price label onto the Budget/Mid-range/Luxury scale"""
+    label = str(item.get("category" if kind == "hotel" else "budget_level", "")).lower()
+    if "budget" in label or "hostel" in label:
+        return "Budget"
+    if "5" in label or "fine" in label or "luxury" in label:
+        return "Luxury"
+    return "Mid-range" if label else ""
+
+
+def parse_coordinates(value) -> tuple | None:
+    """'35.71, 139.79' -> (35.71, 139.79); anything else -> None"""
+    numbers = re.findall(r"-?\d+(?:\.\d+)?", str(value or ""))
+    if len(numbers) < 2:
+        return None
+    lat, lng = float(numbers[0]), float(numbers[1])
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or (lat == 0 and lng == 0):
+        return None
+    return lat, lng
+
+
+class POIStore:
+    """SQLite store of every enriched place, restaurant and hotel
+
+    FTS5 indexes names, categories and cuisines; an R-tree indexes coordinates.
+    Agents query it first and only call Tavily and the LLM for missing or stale rows.
+    """
+
+    def __init__(self, path: str = POI_STORE_PATH, max_age_days: float | None = None):
+        self.path = path
+        if max_age_days is None:
+            max_age_days = float(os.getenv("POI_STORE_MAX_AGE_DAYS", "30"))
+        self.max_age = max_age_days * 86400
+        self._local = threading.local()
+
+        if path == ":memory:":
+            # Every thread has its own connection, so they must all open the same named
+            # in-memory database
+            self._uri = f"file:poi-{uuid.uuid4().hex}?mode=memory&cache=shared"
+        else:
+            self._uri = None
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connection()
+        connection.executescript(SCHEMA)
+        # A shared in-memory database lives as long as one connection to it is open
+        self._keep_alive = connection if self._uri is not None else None
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets readers run alongside the writer"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self._uri is not None:
+                connection = sqlite3.connect(self._uri, timeout=10, uri=True)
+            else:
+                connection = sqlite3.connect(self.path, timeout=10)
+            connection.row_factory = sqlite3.Row
+            if self._uri is None:
+                connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def upsert(self, kind: str, destination_key: str, items: list):
+        """Insert or refresh items, keyed by (kind, destination, normalized name)"""
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            for item in items:
+                name = item.get("name")
+                if not name:
+                    continue
+                cuisine = item.get("cuisine", "")
+                row = connection.execute(
+                    """
+                    INSERT INTO pois (kind, destination_key, name, name_key, category, cuisine, budget_level, rating, data, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (kind, destination_key, name_key) DO UPDATE SET
+                        name = excluded.name, category = excluded.category, cuisine = excluded.cuisine,
+                        budget_level = excluded.budget_level, rating = excluded.rating,
+                        data = excluded.data, updated_at = excluded.updated_at
+                    RETURNING id
+                    """,
+                    (
+                        kind, destination_key, name, normalize(name),
+                        str(item.get("category", "")),
+                        ", ".join(cuisine) if isinstance(cuisine, list) else str(cuisine),
+                        item_budget_level(kind, item),
+                        _as_float(item.get("rating")),
+                        json.dumps(item, ensure_ascii=False),
+                        now
+                    )
+                ).fetchone()
+
+                coordinates = parse_coordinates(item.get("coordinates"))
+                connection.execute("DELETE FROM pois_rtree WHERE id = ?", (row["id"],))
+                if coordinates:
+                    lat, lng = coordinates
+                    connection.execute(
+                        "INSERT INTO pois_rtree (id, min_lat, max_lat, min_lng, max_lng) VALUES (?, ?, ?, ?, ?)",
+                        (row["id"], lat, lat, lng, lng)
+                    )
+
+    def find(self, kind: str, destination_key: str, interests: list | None = None,
+             budget_level: str | None = None, limit: int = 8) -> list:
+        """Fresh items for a destination, best matches for interests and budget level first"""
+        match = _fts_query(interests or [])
+        rows = self._connection().execute(
+            f"""
+            SELECT pois.data,
+                   {"pois.id IN (SELECT rowid FROM pois_fts WHERE pois_fts MATCH ?)" if match else "0"} AS interest_match,
+                   pois.budget_level = ? AS budget_match
+            FROM pois
+            WHERE pois.kind = ? AND pois.destination_key = ? AND pois.updated_at >= ?
+            ORDER BY interest_match DESC, budget_match DESC, pois.rating DESC
+            LIMIT ?
+            """,
+            ([match] if match else []) + [budget_level or "", kind, destination_key, time.time() - self.max_age, limit]
+        ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+    def nearby(self, lat: float, lng: float, radius_km: float = 2.0, kind: str | None = None, limit: int = 20) -> list:
+        """Items whose coordinates fall within radius_km of a point (bounding box on the R-tree)"""
+        dlat = radius_km / 111.0
+        dlng = radius_km / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+        rows = self._connection().execute(
+            """
+            SELECT pois.data FROM pois_rtree
+            JOIN pois ON pois.id = pois_rtree.id
+            WHERE pois_rtree.min_lat >= ? AND pois_rtree.max_lat <= ?
+              AND pois_rtree.min_lng >= ? AND pois_rtree.max_lng <= ?
+              AND (? IS NULL OR pois.kind = ?)
+            ORDER BY pois.rating DESC
+            LIMIT ?
+            """,
+            (lat - dlat, lat + dlat, lng - dlng, lng + dlng, kind, kind, limit)
+        ).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+
+
+def _as_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _fts_query(interests: list) -> str:
+    """['street food', 'temples'] -> '"street" OR "food" OR "temples"' (quoted, so user text is never FTS syntax)"""
+    terms = []
+    for interest in interests:
+        for term in normalize(interest).split():
+            if len(term) > 2 and term not in terms:
+                terms.append(term)
+    return " OR ".join(f'"{term}"' for term in terms)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_poi_store() -> POIStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = POIStore()
+        return _store
@@ -0,0 +1,212 @@
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "profiles"))
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class Profile:
+    """Sampling profiler for a single plan request
+
+    A background thread samples the stacks of the threads currently working for this
+    request (the request thread, city workers, enrichment workers) every few
+    milliseconds and counts them as collapsed stacks. Each workflow node also records
+    its wall-clock and CPU time, so time spent waiting on upstreams (wall >> cpu) is
+    easy to tell apart from our own Python overhead (cpu ~ wall).
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.id = uuid.uuid4().hex
+        self.interval = interval
+        self.created = time.time()
+        self.stacks = Counter()
+        self.nodes = []
+        self.samples = 0
+        # CPU time of every thread while it was working for this request
+        self.cpu = 0.0
+        self._lock = threading.Lock()
+        self._threads = Counter()
+        self._started = time.perf_counter()
+        self._wall = None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profile-{self.id[:8]}", daemon=True)
+        self._sampler.start()
+
+    @contextmanager
+    def attach(self):
+        """Sample the current thread while the block runs"""
+        ident = threading.get_ident()
+        with self._lock:
+            outermost = self._threads[ident] == 0
+            self._threads[ident] += 1
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                if outermost:
+                    self.cpu += time.thread_time() - cpu
+                self._threads[ident] -= 1
+                if self._threads[ident] <= 0:
+                    del self._threads[ident]
+
+    @contextmanager
+    def track(self, node: str, **labels):
+        """Sample the current thread and record the block's wall-clock and CPU time"""
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            with self.attach():
+                yield
+        finally:
+            entry = {
+                "node": node,
+                **labels,
+                "thread": threading.current_thread().name,
+                "start": round(wall - self._started, 4),
+                "wall": round(time.perf_counter() - wall, 4),
+                "cpu": round(time.thread_time() - cpu, 4)
+            }
+            with self._lock:
+                self.nodes.append(entry)
+
+    def run(self, node: str, fn, *args):
+        """Call fn(*args) as a tracked unit of work, for use with executor.submit"""
+        with self.track(node):
+            return fn(*args)
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                threads = [ident for ident in self._threads if ident != own]
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                with self._lock:
+                    # Root first, as flamegraph.pl and speedscope expect
+                    self.stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def stop(self):
+        if self._wall is None:
+            self._wall = time.perf_counter() - self._started
+            self._stop.set()
+            self._sampler.join()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            nodes = sorted(self.nodes, key=lambda entry: entry["start"])
+            stacks = dict(self.stacks.most_common())
+            samples = self.samples
+            cpu = self.cpu
+        return {
+            "id": self.id,
+            "created": self.created,
+            "wall_seconds": round(self._wall if self._wall is not None else time.perf_counter() - self._started, 4),
+            "cpu_seconds": round(cpu, 4),
+            "interval_ms": self.interval * 1000,
+            "samples": samples,
+            "nodes": nodes,
+            "stacks": stacks
+        }
+
+    def save(self, directory: str = PROFILE_DIR, **extra) -> str:
+        """Stop sampling and write the profile as JSON, keeping only the most recent ones"""
+        self.stop()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.id}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**self.to_dict(), **extra}, f)
+        _prune(directory, int(os.getenv("PROFILE_KEEP", "50")))
+        return path
+
+
+def start_profile(header_value: str | None = None) -> Profile | None:
+    """Start a profile when the X-Profile header carries the admin token, or when sampled
+
+    Returns None otherwise; nothing is sampled or timed for requests without a profile.
+    """
+    token = os.getenv("PROFILE_ADMIN_TOKEN")
+    requested = bool(token) and header_value is not None and hmac.compare_digest(header_value, token)
+    sample_rate = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    if not requested and not (sample_rate > 0 and random.random() < sample_rate):
+        return None
+    return Profile(interval=float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000)
+
+
+def profiles_authorized(header_value: str | None) -> bool:
+    """Profile endpoints are admin-only: closed unless PROFILE_ADMIN_TOKEN is set and sent"""
+    token = os.getenv("PROFILE_ADMIN_TOKEN")
+    return bool(token) and header_value is not None and hmac.compare_digest(header_value, token)
+
+
+def _prune(directory: str, keep: int):
+    paths = sorted(
+        (os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".json")),
+        key=os.path.getmtime,
+        reverse=True
+    )
+    for path in paths[keep:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def list_profiles(directory: str = PROFILE_DIR) -> list:
+    """Summaries of saved profiles, newest first"""
+    if not os.path.isdir(directory):
+        return []
+    summaries = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            continue
+        summaries.append({
+            "id": profile["id"],
+            "created": profile["created"],
+            "wall_seconds": profile["wall_seconds"],
+            "cpu_seconds": profile["cpu_seconds"],
+            "samples": profile["samples"],
+            "job_id": profile.get("job_id")
+        })
+    return sorted(summaries, key=lambda summary: summary["created"], reverse=True)
+
+
+def load_profile(profile_id: str, directory: str = PROFILE_DIR) -> dict | None:
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(directory, f"{profile_id}.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except OSError:
+        return None
+
+
+def collapsed(profile: dict) -> str:
+    """Collapsed-stack text ("a;b;c 42" per line) for flamegraph.pl or speedscope"""
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].items())
@@ -0,0 +1,119 @@
+import gzip
+import os
+
+from plan_store import content_hash
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Item lists that get ids and can be projected
+ITEM_KEYS = ("places", "restaurants", "hotels")
+
+# fields=summary: what a list view needs (name, rating, image, cost); details are fetched by id
+SUMMARY_FIELDS = (
+    "name", "category", "cuisine", "city", "rating", "image_url",
+    "entry_fee", "avg_cost_per_person", "budget_level", "price_per_night", "total_estimated"
+)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def add_item_ids(plan: dict) -> dict:
+    """Give every place, restaurant and hotel its plan store hash as `id`"""
+    for key in ITEM_KEYS:
+        for item in plan.get(key) or []:
+            item["id"] = content_hash({k: v for k, v in item.items() if k != "id"})
+    return plan
+
+
+def parse_fields(value) -> tuple | None:
+    """'summary' or 'name,rating,image_url' (or a list) -> field names; None means everything"""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    fields = tuple(field.strip() for field in value if field and field.strip())
+    if fields == ("summary",):
+        return SUMMARY_FIELDS
+    return fields or None
+
+
+def project(plan: dict, fields: tuple | None) -> dict:
+    """Keep only `fields` (plus id) of every item; the rest of the plan is unchanged"""
+    if not fields:
+        return plan
+    keep = set(fields) | {"id"}
+    projected = dict(plan)
+    for key in ITEM_KEYS:
+        if key in plan:
+            projected[key] = [{k: v for k, v in item.items() if k in keep} for item in plan[key] or []]
+    return projected
+
+
+def _parse_accept_encoding(accept_encoding: str) -> dict:
+    """'gzip;q=0.5, br, *;q=0' -> {'gzip': 0.5, 'br': 1.0, '*': 0.0}"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, *params = [piece.strip() for piece in part.split(";")]
+        if not coding:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.lower()] = q
+    return weights
+
+
+def _accepted_encoding(accept_encoding: str) -> str | None:
+    """Best encoding we support with q > 0; codings not listed fall back to '*'"""
+    weights = _parse_accept_encoding(accept_encoding)
+    wildcard = weights.get("*", 0.0)
+    candidates = [("br", 2), ("gzip", 1)] if brotli is not None else [("gzip", 1)]
+    best = None
+    for coding, preference in candidates:
+        q = weights.get(coding, wildcard)
+        # Higher q wins; on a tie brotli is preferred
+        if q > 0 and (best is None or (q, preference) > best[0]):
+            best = ((q, preference), coding)
+    return best[1] if best else None
+
+
+def finalize(response, request):
+    """ETag and conditional GET, then compression for large bodies
+
+    The ETag is taken from the uncompressed body and marked weak, since the gzip and
+    brotli variants carry the same content; a matching If-None-Match gets a 304.
+    """
+    if response.direct_passthrough or response.is_streamed or response.status_code != 200:
+        return response
+
+    if request.method in ("GET", "HEAD"):
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+        if response.status_code == 304:
+            return response
+
+    response.vary.add("Accept-Encoding")
+    if response.content_encoding or not (response.mimetype or "").startswith(COMPRESSIBLE_TYPES):
+        return response
+
+    body = response.get_data()
+    if len(body) < int(os.getenv("COMPRESS_MIN_BYTES", "1024")):
+        return response
+
+    encoding = _accepted_encoding(request.headers.get("Accept-Encoding", ""))
+    if encoding == "br":
+        response.set_data(brotli.compress(body, quality=5))
+    elif encoding == "gzip":
+        response.set_data(gzip.compress(body, compresslevel=6))
+    else:
+        return response
+    response.content_encoding = encoding
+    return response
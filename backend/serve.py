@@ -0,0 +1,117 @@
+"""Production entry point: pre-fork N worker processes sharing one listening socket
+
+    python serve.py --workers 4 --port 5000
+
+Each worker imports the app after the fork (so no threads are inherited half-alive)
+and serves requests on its own threads. Workers share Tavily, image and geocode results
+and LLM completions through the file-backed cache, and running jobs through CACHE_DIR/jobs
+so cancels reach any worker (CACHE_BACKEND=file and LLM_CACHE_ENABLED=1, set by default
+here).
+A worker that dies is replaced; SIGINT/SIGTERM stops all of them.
+"""
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def listen(host: str, port: int, backlog: int = 128) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, host: str, port: int):
+    """Serve the app on the inherited socket until told to stop; never returns"""
+    # Stop serving on SIGTERM from the parent; SIGINT is the parent's to handle
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    from werkzeug.serving import make_server
+    from app import app
+
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+    logger.info("👷 Worker %d serving on %s:%d", os.getpid(), host, port)
+    try:
+        server.serve_forever()
+    finally:
+        os._exit(0)
+
+
+def spawn(sock: socket.socket, host: str, port: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(sock, host, port)
+        except SystemExit:
+            pass
+        except BaseException:
+            logger.exception("Worker crashed")
+        os._exit(1)
+    return pid
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Serve the API with several pre-forked worker processes")
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WORKERS", str(os.cpu_count() or 2))),
+                        help="worker processes (default: WORKERS or the number of CPUs)")
+    args = parser.parse_args(argv)
+
+    # One result per host instead of one per worker
+    os.environ.setdefault("CACHE_BACKEND", "file")
+    os.environ.setdefault("LLM_CACHE_ENABLED", "1")
+
+    from logging_setup import configure_logging
+
+    sock = listen(args.host, args.port)
+    workers = {spawn(sock, args.host, args.port) for _ in range(args.workers)}
+
+    # The parent only supervises; its logging thread is started after forking
+    configure_logging()
+    logger.info("🚀 Serving on %s:%d with %d workers (cache backend: %s)",
+                args.host, args.port, args.workers, os.environ["CACHE_BACKEND"])
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            logger.warning("Worker %d exited (status %d), starting a new one", pid, status)
+            # Avoid a tight respawn loop when workers crash on startup
+            time.sleep(1)
+            workers.add(spawn(sock, args.host, args.port))
+
+    sock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
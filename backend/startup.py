@@ -0,0 +1,83 @@
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+_started = time.perf_counter()
+_lock = threading.Lock()
+_components = []
+
+
+@contextmanager
+def timed(component: str, phase: str):
+    """Record how long a heavy import or construction took (phase: 'import' or 'construct')"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        with _lock:
+            _components.append({
+                "component": component,
+                "phase": phase,
+                "seconds": round(seconds, 4),
+                "at": round(started - _started, 4),
+                "thread": threading.current_thread().name
+            })
+        logger.debug("⏱️ %s %s took %.3fs", phase, component, seconds)
+
+
+def lazy_import(module: str):
+    """Import a heavy dependency on first use, recording the time only when it was not loaded yet"""
+    if module in sys.modules:
+        # import_module still waits if another thread is halfway through importing it
+        return importlib.import_module(module)
+    with timed(module, "import"):
+        return importlib.import_module(module)
+
+
+def mark_ready(what: str = "app"):
+    """Record the moment the app (or warm-up) became ready to serve"""
+    with _lock:
+        _components.append({
+            "component": what,
+            "phase": "ready",
+            "seconds": 0,
+            "at": round(time.perf_counter() - _started, 4),
+            "thread": threading.current_thread().name
+        })
+
+
+def report() -> dict:
+    """Import and construction time per component, in the order they happened"""
+    with _lock:
+        components = list(_components)
+    totals = {}
+    for entry in components:
+        if entry["phase"] == "ready":
+            continue
+        totals[entry["phase"]] = round(totals.get(entry["phase"], 0) + entry["seconds"], 4)
+    return {"uptime": round(time.perf_counter() - _started, 4), "totals": totals, "components": components}
+
+
+def warm_up_enabled() -> bool:
+    return os.getenv("WARMUP", "").lower() in ("1", "true", "yes")
+
+
+def warm_up_in_background(warm_up):
+    """Run warm_up() on a daemon thread so the server can accept requests meanwhile"""
+    def run():
+        try:
+            warm_up()
+            mark_ready("warm_up")
+        except Exception as e:
+            logger.warning("Warm-up failed: %s", e)
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,156 @@
+import random
+import re
+
+import pytest
+
+from budget import BudgetModel, parse_amount, parse_costs
+
+
+def reference_breakdown(travel_details: dict, hotels: list, itinerary: list, places: list) -> dict:
+    """The per-item loop BudgetModel.breakdown() replaced, kept to check it against"""
+    def extract_cost(cost_str) -> float:
+        if not cost_str or cost_str == "Free" or cost_str == "N/A":
+            return 0
+        numbers = re.findall(r'\d+', str(cost_str))
+        if numbers:
+            if len(numbers) >= 2:
+                return (float(numbers[0]) + float(numbers[1])) / 2
+            return float(numbers[0])
+        return 0
+
+    hotel_costs = {}
+    for hotel in hotels:
+        hotel_costs.setdefault(hotel.get("city"), []).append(extract_cost(hotel.get("total_estimated", "0")))
+    accommodation = sum(min(costs) for costs in hotel_costs.values())
+    food = sum(extract_cost(day.get("estimated_cost", "0")) for day in itinerary)
+    activities = sum(extract_cost(place.get("entry_fee", "0")) for place in places)
+
+    budget = travel_details.get("budget", 2000)
+    transportation = budget * 0.12
+    miscellaneous = budget * 0.08
+    total = accommodation + food + activities + transportation + miscellaneous
+    return {
+        "accommodation": round(accommodation, 2),
+        "food": round(food, 2),
+        "activities": round(activities, 2),
+        "transportation": round(transportation, 2),
+        "miscellaneous": round(miscellaneous, 2),
+        "total_estimated": round(total, 2),
+        "user_budget": budget,
+        "remaining": round(budget - total, 2),
+        "within_budget": budget - total >= 0
+    }
+
+
+def random_cost(rng: random.Random) -> str:
+    low = rng.randint(0, 400)
+    return rng.choice([
+        "Free", "N/A", "", f"${low}", f"${low}-{low + rng.randint(0, 300)}",
+        f"{low} - {low + rng.randint(0, 300)} USD", f"about ${low} per person"
+    ])
+
+
+def random_trip(rng: random.Random) -> tuple:
+    cities = ["Tokyo", "Kyoto", "Osaka"][:rng.randint(1, 3)]
+    travel_details = {"budget": rng.choice([800, 2000, 3500, 10000]), "travelers": rng.randint(1, 5)}
+    hotels = [{"name": f"Hotel {i}", "city": rng.choice(cities), "total_estimated": random_cost(rng)}
+              for i in range(rng.randint(0, 6))]
+    itinerary = [{"day": i + 1, "estimated_cost": random_cost(rng)} for i in range(rng.randint(0, 7))]
+    places = [{"name": f"Place {i}", "entry_fee": random_cost(rng)} for i in range(rng.randint(0, 8))]
+    return travel_details, hotels, itinerary, places
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("$50-100", (50, 100)),
+    ("$50", (50, 50)),
+    ("Free", (0, 0)),
+    (None, (0, 0)),
+    ("$1,200-1,500", (1200, 1500)),
+    ("100-50", (50, 100)),
+    ("$12.50 - $20", (12.5, 20)),
+])
+def test_parse_costs(value, expected):
+    assert parse_costs([value]).tolist() == [list(expected)]
+
+
+def test_parse_costs_of_nothing_is_an_empty_pair_array():
+    assert parse_costs([]).shape == (0, 2)
+
+
+@pytest.mark.parametrize("value, expected", [
+    (3000, 3000.0),
+    ("3000", 3000.0),
+    ("$3,000", 3000.0),
+    ("about 2500 USD", 2500.0),
+    ("flexible", 2000.0),
+    (None, 2000.0),
+    (True, 2000.0),
+])
+def test_parse_amount(value, expected):
+    assert parse_amount(value, 2000.0) == expected
+
+
+def test_breakdown_matches_the_reference_on_random_trips():
+    rng = random.Random(40)
+    for _ in range(300):
+        trip = random_trip(rng)
+        assert BudgetModel(*trip).breakdown() == reference_breakdown(*trip)
+
+
+def test_breakdown_without_hotels_or_costs():
+    breakdown = BudgetModel({"budget": 1000}, [], [], []).breakdown()
+    assert breakdown["accommodation"] == 0
+    assert breakdown["total_estimated"] == 200
+    assert breakdown["remaining"] == 800
+    assert breakdown["within_budget"] is True
+
+
+def test_non_numeric_budget_falls_back_to_its_number():
+    breakdown = BudgetModel({"budget": "$3,000"}, [], [], []).breakdown()
+    assert breakdown["user_budget"] == 3000.0
+    assert breakdown["transportation"] == 360
+
+
+def test_evaluate_shapes_follow_hotels_budgets_and_travelers():
+    rng = random.Random(7)
+    travel_details, _, itinerary, places = random_trip(rng)
+    hotels = [{"name": f"Hotel {i}", "city": city, "total_estimated": f"${100 * (i + 1)}"}
+              for i, city in enumerate(["Tokyo", "Tokyo", "Kyoto"])]
+    grid = BudgetModel(travel_details, hotels, itinerary, places).evaluate(budgets=[500, 1000], travelers=[1, 2, 3, 4])
+
+    assert grid["budgets"] == [500, 1000]
+    assert grid["travelers"] == [1, 2, 3, 4]
+    assert len(grid["hotels"]) == 3
+    for key in ("total_low", "total", "total_high", "within_budget"):
+        assert [len(row) for row in grid[key]] == [2, 2, 2]
+        assert all(len(cell) == 4 for row in grid[key] for cell in row)
+
+
+def test_evaluate_at_the_trip_itself_matches_the_breakdown():
+    rng = random.Random(11)
+    for _ in range(50):
+        trip = random_trip(rng)
+        if not trip[1]:
+            continue
+        model = BudgetModel(*trip)
+        grid = model.evaluate(budgets=[model.budget], travelers=[model.travelers])
+        cheapest = min(option[0][0] for option in grid["total"])
+        assert cheapest == pytest.approx(model.breakdown()["total_estimated"], abs=0.02)
+
+
+def test_evaluate_scales_shared_costs_per_person_and_hotels_per_room():
+    travel_details = {"budget": 900, "travelers": 2}
+    hotels = [{"name": "Hotel", "city": "Tokyo", "total_estimated": "$300"}]
+    itinerary = [{"estimated_cost": "$100"}]
+    grid = BudgetModel(travel_details, hotels, itinerary, []).evaluate(budgets=[900], travelers=[1, 2, 3, 4])
+
+    fixed = 900 * 0.2
+    assert grid["total"][0][0] == [300 + 50 + fixed, 300 + 100 + fixed, 600 + 150 + fixed, 600 + 200 + fixed]
+    assert grid["within_budget"][0][0] == [True, True, False, False]
+
+
+def test_evaluate_ranges_bracket_the_midpoint():
+    hotels = [{"name": "Hotel", "city": "Tokyo", "total_estimated": "$200-400"}]
+    grid = BudgetModel({"budget": 2000, "travelers": 2}, hotels, [{"estimated_cost": "$50-150"}], []).evaluate(
+        budgets=[2000], travelers=[2])
+    assert grid["total_low"][0][0][0] < grid["total"][0][0][0] < grid["total_high"][0][0][0]
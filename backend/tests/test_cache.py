@@ -0,0 +1,170 @@
+import threading
+import time
+
+import pytest
+
+from cache import FileStore, MemoCache, cache_key
+from deadline import DeadlineExceeded
+
+
+def test_cache_key_is_stable():
+    assert cache_key("tokyo-jp", "temples", 5) == cache_key("tokyo-jp", "temples", 5)
+    assert cache_key("tokyo-jp", "temples", 5) != cache_key("tokyo-jp", "temples", 6)
+
+
+def test_hit_after_miss():
+    cache = MemoCache("test")
+    calls = []
+    assert cache.get_or_compute("k", lambda: calls.append(1) or "v") == "v"
+    assert cache.get_or_compute("k", lambda: calls.append(1) or "other") == "v"
+    assert calls == [1]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_expired_entries_are_recomputed():
+    cache = MemoCache("test", ttl=0)
+    assert cache.get_or_compute("k", lambda: 1) == 1
+    assert cache.get_or_compute("k", lambda: 2) == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MemoCache("test", max_entries=2)
+    cache.get_or_compute("a", lambda: "a")
+    cache.get_or_compute("b", lambda: "b")
+    cache.get_or_compute("a", lambda: "stale")
+    cache.get_or_compute("c", lambda: "c")
+    assert cache.get_or_compute("a", lambda: "new") == "a"
+    assert cache.get_or_compute("b", lambda: "new") == "new"
+
+
+def run_owner(cache, key, compute):
+    """Start `compute` as the owner of `key` on another thread; returns (thread, outcome)"""
+    started = threading.Event()
+    outcome = {}
+
+    def owner():
+        def wrapped():
+            started.set()
+            return compute()
+        try:
+            outcome["value"] = cache.get_or_compute(key, wrapped)
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=owner)
+    thread.start()
+    assert started.wait(2)
+    return thread, outcome
+
+
+def test_concurrent_callers_share_one_computation():
+    cache = MemoCache("test")
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return "v"
+
+    thread, outcome = run_owner(cache, "k", slow)
+    results = []
+    joiners = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", slow))) for _ in range(5)]
+    for joiner in joiners:
+        joiner.start()
+    time.sleep(0.05)
+    release.set()
+    for joiner in joiners + [thread]:
+        joiner.join(2)
+
+    assert calls == [1]
+    assert results == ["v"] * 5
+    assert outcome["value"] == "v"
+
+
+def test_errors_reach_waiters_but_are_never_cached():
+    cache = MemoCache("test")
+    release = threading.Event()
+
+    def failing():
+        release.wait(2)
+        raise ValueError("upstream down")
+
+    thread, outcome = run_owner(cache, "k", failing)
+    errors = []
+
+    def joiner():
+        try:
+            cache.get_or_compute("k", lambda: "unused")
+        except ValueError as e:
+            errors.append(e)
+
+    waiter = threading.Thread(target=joiner)
+    waiter.start()
+    time.sleep(0.05)
+    release.set()
+    waiter.join(2)
+    thread.join(2)
+
+    assert isinstance(outcome["error"], ValueError)
+    assert len(errors) == 1
+    assert cache.get_or_compute("k", lambda: "recovered") == "recovered"
+
+
+def test_waiter_gives_up_after_its_timeout():
+    cache = MemoCache("test")
+    release = threading.Event()
+    thread, _ = run_owner(cache, "k", lambda: release.wait(2) and "v")
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        cache.get_or_compute("k", lambda: "unused", timeout=0.1)
+    assert time.monotonic() - started < 1
+    release.set()
+    thread.join(2)
+
+
+def test_waiter_recomputes_when_owner_ran_out_of_time():
+    cache = MemoCache("test")
+    release = threading.Event()
+
+    def cut_short():
+        release.wait(2)
+        raise DeadlineExceeded("owner's deadline")
+
+    thread, outcome = run_owner(cache, "k", cut_short)
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", lambda: "mine", timeout=5)))
+    waiter.start()
+    time.sleep(0.05)
+    release.set()
+    waiter.join(2)
+    thread.join(2)
+
+    assert isinstance(outcome["error"], DeadlineExceeded)
+    assert results == ["mine"]
+
+
+def test_file_store_is_shared_between_caches(tmp_path):
+    first = MemoCache("test", store=FileStore(str(tmp_path), ttl=60))
+    second = MemoCache("test", store=FileStore(str(tmp_path), ttl=60))
+    assert first.get_or_compute("k", lambda: {"results": [1, 2]}) == {"results": [1, 2]}
+    assert second.get_or_compute("k", lambda: "recomputed") == {"results": [1, 2]}
+    assert second.shared_hits == 1
+
+
+def test_file_store_ignores_expired_entries(tmp_path):
+    store = FileStore(str(tmp_path), ttl=-1)
+    store.set("k", "v")
+    assert store.get("k") == (False, None)
+
+
+def test_put_values_are_found_by_peek_and_get_or_compute(tmp_path):
+    cache = MemoCache("test", store=FileStore(str(tmp_path), ttl=60))
+    assert cache.peek("k") == (False, None)
+
+    cache.put("k", "streamed")
+
+    assert cache.peek("k") == (True, "streamed")
+    assert cache.get_or_compute("k", lambda: "computed") == "streamed"
+    assert MemoCache("other", store=FileStore(str(tmp_path), ttl=60)).peek("k") == (True, "streamed")
@@ -0,0 +1,100 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", fake)
+    return fake
+
+
+def open_breaker(clock, **kwargs) -> CircuitBreaker:
+    """A breaker that has just moved to half_open after one failure"""
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30, **kwargs)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.now += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    return breaker
+
+
+def test_opens_after_threshold_and_rejects(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_probe_success_closes(clock):
+    breaker = open_breaker(clock)
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = open_breaker(clock)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+
+def test_release_gives_back_probe(clock):
+    breaker = open_breaker(clock)
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+
+def test_release_when_closed_is_harmless(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.allow_request()
+
+
+def test_unreported_probe_is_rearmed_after_reset_timeout(clock):
+    breaker = open_breaker(clock)
+    assert breaker.allow_request()
+    # The probe never reports back
+    clock.now += 29
+    assert not breaker.allow_request()
+    clock.now += 1
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_max_calls(clock):
+    breaker = open_breaker(clock, half_open_max_calls=2)
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
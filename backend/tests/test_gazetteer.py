@@ -0,0 +1,29 @@
+import pytest
+
+from gazetteer import get_gazetteer
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Paris", "paris-fr"),
+    ("Paris, France", "paris-fr"),
+    ("Paris, FR", "paris-fr"),
+    ("Kyotto, Japan", "kyoto-jp"),
+    # Common spellings of the country, or a region of it
+    ("London, UK", "london-gb"),
+    ("London, England", "london-gb"),
+    ("New York, USA", "new-york-us"),
+    ("New York, NY", "new-york-us"),
+    ("New York, NY, USA", "new-york-us"),
+    ("Los Angeles, CA", "los-angeles-us"),
+    ("Dubai, UAE", "dubai-ae"),
+    ("Seoul, Korea", "seoul-kr"),
+    # A hint we do not know is ignored
+    ("Kyoto, Kansai", "kyoto-jp"),
+    # Same name in another country: unresolved rather than the wrong city
+    ("Paris, Texas", None),
+    ("Rome, Georgia", None),
+    ("London, Ontario", None),
+])
+def test_lookup_country_hint(text, expected):
+    entry = get_gazetteer().lookup(text)
+    assert (entry and entry["id"]) == expected
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import cache
+from agents.base_agent import BaseAgent
+from deadline import Deadline
+
+ITEMS = [
+    {"name": "Senso-ji", "entry_fee": "Free"},
+    {"name": "Meiji Shrine", "tags": ["shrine", "park, forest"]},
+    {"name": "Tokyo Tower", "entry_fee": "$10-20"}
+]
+
+
+class FakeLLM:
+    """Returns `text` in one piece from invoke() and in small chunks from stream()"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+    def invoke(self, messages, **kwargs):
+        return SimpleNamespace(content=self.text)
+
+    def stream(self, messages, **kwargs):
+        for start in range(0, len(self.text), 5):
+            yield SimpleNamespace(content=self.text[start:start + 5])
+
+
+def make_agent(text: str) -> BaseAgent:
+    agent = BaseAgent()
+    agent._llm = FakeLLM(text)
+    return agent
+
+
+def run(agent: BaseAgent, deadline: Deadline | None = None) -> tuple:
+    calls = []
+    lock = threading.Lock()
+
+    def enrich(index, item):
+        item["image_url"] = f"image-{item['name']}"
+        with lock:
+            calls.append(index)
+
+    items = agent.generate_list("system", "user", enrich, deadline)
+    return items, sorted(calls)
+
+
+@pytest.fixture(params=["1", "0"], ids=["streaming", "not-streaming"])
+def streaming(request, monkeypatch):
+    monkeypatch.setenv("LLM_STREAMING", request.param)
+    monkeypatch.delenv("LLM_CACHE_ENABLED", raising=False)
+    return request.param == "1"
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(ITEMS),
+    "```json\n" + json.dumps(ITEMS, indent=2) + "\n```"
+])
+def test_streaming_and_non_streaming_give_the_same_list(streaming, text):
+    items, calls = run(make_agent(text), Deadline(30))
+
+    assert items == [{**item, "image_url": f"image-{item['name']}"} for item in ITEMS]
+    assert calls == [0, 1, 2]
+
+
+def test_invalid_json_raises_like_json_loads(streaming):
+    with pytest.raises(json.JSONDecodeError):
+        run(make_agent('[{"name": "Senso-ji"}, {oops}]'))
+
+
+def test_truncated_stream_raises(streaming):
+    with pytest.raises(json.JSONDecodeError):
+        run(make_agent(json.dumps(ITEMS)[:-10]))
+
+
+def test_waiting_for_enrichment_is_bounded_by_the_deadline(monkeypatch):
+    monkeypatch.setenv("LLM_STREAMING", "1")
+    monkeypatch.setattr(BaseAgent, "ENRICH_GRACE_SECONDS", 0.1)
+    release = threading.Event()
+    deadline = Deadline(0.3)
+
+    def stuck(index, item):
+        release.wait(5)
+
+    started = time.monotonic()
+    try:
+        items = make_agent(json.dumps(ITEMS)).generate_list("system", "user", stuck, deadline)
+    finally:
+        release.set()
+
+    assert time.monotonic() - started < 2
+    assert [item["name"] for item in items] == [item["name"] for item in ITEMS]
+    assert "enrichment" in deadline.degraded
+
+
+def test_streamed_completion_is_cached_and_reused(monkeypatch):
+    monkeypatch.setenv("LLM_STREAMING", "1")
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "1")
+    monkeypatch.setattr(cache, "_caches", {})
+
+    first, _ = run(make_agent(json.dumps(ITEMS)))
+
+    # A cache hit never reaches the LLM
+    agent = make_agent("")
+    agent._llm.stream = agent._llm.invoke = None
+    second, calls = run(agent)
+
+    assert second == first
+    assert calls == [0, 1, 2]
+
+
+def test_unparseable_streamed_completion_is_not_cached(monkeypatch):
+    monkeypatch.setenv("LLM_STREAMING", "1")
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "1")
+    monkeypatch.setattr(cache, "_caches", {})
+
+    with pytest.raises(json.JSONDecodeError):
+        run(make_agent(json.dumps(ITEMS)[:-10]))
+
+    items, _ = run(make_agent(json.dumps(ITEMS)))
+    assert [item["name"] for item in items] == [item["name"] for item in ITEMS]
@@ -0,0 +1,55 @@
+import os
+import time
+
+import pytest
+
+from deadline import Deadline
+from jobs import JobRegistry
+
+
+def test_cancel_local_job():
+    jobs = JobRegistry()
+    deadline = Deadline(30)
+    jobs.register("job", deadline)
+    assert jobs.cancel("job")
+    assert deadline.cancelled
+    jobs.unregister("job", deadline)
+    assert not jobs.cancel("job")
+
+
+def test_resubmit_supersedes():
+    jobs = JobRegistry()
+    first, second = Deadline(30), Deadline(30)
+    jobs.register("job", first)
+    jobs.register("job", second)
+    assert first.cancel_reason == "superseded"
+    assert not second.cancelled
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_cancel_reaches_job_on_another_worker(tmp_path):
+    ready_r, ready_w = os.pipe()
+    done_r, done_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        # The worker running the job
+        jobs = JobRegistry(str(tmp_path), poll_interval=0.05)
+        deadline = Deadline(30)
+        jobs.register("job", deadline)
+        os.write(ready_w, b"1")
+        for _ in range(100):
+            if deadline.cancelled:
+                break
+            time.sleep(0.02)
+        jobs.unregister("job", deadline)
+        os.write(done_w, b"1" if deadline.cancelled else b"0")
+        os._exit(0)
+
+    os.read(ready_r, 1)
+    jobs = JobRegistry(str(tmp_path))
+    assert not jobs.cancel("other")
+    assert jobs.cancel("job")
+    assert os.read(done_r, 1) == b"1"
+    os.waitpid(pid, 0)
+    # Finished jobs are no longer published
+    assert not jobs.cancel("job")
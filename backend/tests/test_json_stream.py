@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from json_stream import JsonArrayStream
+
+TEXT = '''```json
+[
+  {"name": "Senso-ji, \\"Asakusa\\"", "tags": ["temple", "old, famous"]},
+  {"name": "Shibuya [Crossing]", "nested": {"a": [1, {"b": "}"}]}},
+  "plain string",
+  42
+]
+```'''
+
+
+def feed_in_chunks(text: str, size: int) -> tuple:
+    parser = JsonArrayStream()
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start:start + size]))
+    return parser, items
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, len(TEXT)])
+def test_elements_match_a_full_parse_for_any_chunking(size):
+    parser, items = feed_in_chunks(TEXT, size)
+    expected = json.loads(TEXT.strip("`").removeprefix("json"))
+
+    assert not parser.failed
+    assert [value for _, value in items] == expected
+    assert json.loads("[" + ",".join(raw for raw, _ in items) + "]") == expected
+
+
+def test_text_after_the_array_is_ignored():
+    _, items = feed_in_chunks('[1, 2] and [3]', 3)
+    assert [value for _, value in items] == [1, 2]
+
+
+def test_empty_array():
+    parser, items = feed_in_chunks("[ ]", 1)
+    assert items == [] and not parser.failed
+
+
+def test_invalid_element_sets_failed_and_stops():
+    parser, items = feed_in_chunks('[{"a": 1}, {bad}, {"c": 3}]', 4)
+    assert parser.failed
+    assert [value for _, value in items] == [{"a": 1}]
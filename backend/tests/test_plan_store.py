@@ -0,0 +1,82 @@
+import threading
+import time
+
+from plan_store import PlanStore, canonical_json, content_hash
+
+
+def make_plan(city: str, places: list) -> dict:
+    return {
+        "travel_details": {"destination": city, "duration": 2},
+        "places": [{"name": name, "city": city} for name in places],
+        "restaurants": [{"name": f"{city} Noodles", "cuisine": "Ramen"}],
+        "hotels": [],
+        "itinerary": [{"day": 1, "title": "Arrival"}],
+        "budget_breakdown": {"total_estimated": 1234.5}
+    }
+
+
+def without_store_fields(plan: dict) -> dict:
+    return {key: value for key, value in plan.items() if key not in ("plan_id", "created_at")}
+
+
+def test_content_hash_ignores_key_order():
+    assert canonical_json({"b": 1, "a": 2}) == canonical_json({"a": 2, "b": 1})
+    assert content_hash({"b": 1, "a": 2}) == content_hash({"a": 2, "b": 1})
+
+
+def test_save_and_load_round_trip():
+    store = PlanStore(":memory:")
+    plan = make_plan("Tokyo", ["Senso-ji", "Meiji Shrine"])
+    plan_id = store.save(plan)
+
+    loaded = store.load(plan_id)
+    assert loaded["plan_id"] == plan_id
+    assert without_store_fields(loaded) == plan
+    assert store.load("missing") is None
+
+
+def test_components_are_stored_once():
+    store = PlanStore(":memory:")
+    store.save(make_plan("Tokyo", ["Senso-ji", "Meiji Shrine"]))
+    store.save(make_plan("Tokyo", ["Senso-ji", "Tokyo Tower"]))
+
+    stats = store.stats()
+    assert stats["plans"] == 2
+    # 3 distinct places, 1 restaurant, 1 itinerary day
+    assert stats["objects"] == 5
+
+
+def test_get_object_by_hash():
+    store = PlanStore(":memory:")
+    plan = make_plan("Tokyo", ["Senso-ji"])
+    store.save(plan)
+
+    place = plan["places"][0]
+    assert store.get_object(content_hash(place)) == {"kind": "places", "item": place}
+    assert store.get_object("0" * 64) is None
+
+
+def test_export_yields_plans_oldest_first():
+    store = PlanStore(":memory:")
+    first = store.save(make_plan("Tokyo", ["Senso-ji"]))
+    time.sleep(0.01)
+    second = store.save(make_plan("Kyoto", ["Kinkaku-ji"]))
+
+    exported = list(store.export(cache_size=1))
+    assert [plan["plan_id"] for plan in exported] == [first, second]
+    assert without_store_fields(exported[1]) == make_plan("Kyoto", ["Kinkaku-ji"])
+
+    since = exported[0]["created_at"]
+    assert [plan["plan_id"] for plan in store.export(since=since)] == [second]
+
+
+def test_memory_store_is_shared_between_threads():
+    store = PlanStore(":memory:")
+    plan_id = store.save(make_plan("Tokyo", ["Senso-ji"]))
+
+    loaded = []
+    thread = threading.Thread(target=lambda: loaded.append(store.load(plan_id)))
+    thread.start()
+    thread.join()
+
+    assert loaded[0]["plan_id"] == plan_id
@@ -0,0 +1,21 @@
+import threading
+
+from poi_store import POIStore
+
+
+def test_memory_store_is_shared_between_threads():
+    store = POIStore(":memory:")
+    store.upsert("places", "tokyo-jp", [{"name": "Senso-ji", "category": "Temple"}])
+
+    found = []
+    thread = threading.Thread(target=lambda: found.extend(store.find("places", "tokyo-jp", limit=5)))
+    thread.start()
+    thread.join()
+
+    assert [item["name"] for item in found] == ["Senso-ji"]
+
+
+def test_memory_stores_are_separate():
+    first, second = POIStore(":memory:"), POIStore(":memory:")
+    first.upsert("places", "tokyo-jp", [{"name": "Senso-ji"}])
+    assert second.find("places", "tokyo-jp", limit=5) == []
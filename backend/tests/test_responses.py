@@ -0,0 +1,32 @@
+import pytest
+
+import responses
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", None),
+    ("gzip", "gzip"),
+    ("gzip, deflate", "gzip"),
+    ("gzip;q=0, identity", None),
+    ("GZIP; q=0.5", "gzip"),
+    ("*", "gzip"),
+    ("*;q=0", None),
+    ("gzip;q=0, *", None),
+    ("identity, *;q=0", None),
+    ("deflate, *;q=0.1", "gzip"),
+])
+def test_accepted_encoding_without_brotli(monkeypatch, header, expected):
+    monkeypatch.setattr(responses, "brotli", None)
+    assert responses._accepted_encoding(header) == expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, br", "br"),
+    ("gzip, br;q=0.5", "gzip"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "br"),
+    ("br;q=0, *;q=0", None),
+])
+def test_accepted_encoding_with_brotli(monkeypatch, header, expected):
+    monkeypatch.setattr(responses, "brotli", object())
+    assert responses._accepted_encoding(header) == expected
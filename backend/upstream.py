@@ -0,0 +1,29 @@
+import os
+import threading
+from contextlib import contextmanager, nullcontext
+
+# Upstreams without a configured limit are not throttled
+_limits = {}
+_limits_lock = threading.Lock()
+
+
+def set_upstream_limit(name: str, max_concurrent: int):
+    """Cap the number of concurrent calls to an upstream (llm, tavily, images, google)"""
+    with _limits_lock:
+        _limits[name] = threading.BoundedSemaphore(max_concurrent)
+
+
+def _get_limit(name: str):
+    with _limits_lock:
+        if name not in _limits:
+            configured = os.getenv(f"UPSTREAM_LIMIT_{name.upper()}")
+            _limits[name] = threading.BoundedSemaphore(int(configured)) if configured else None
+        return _limits[name]
+
+
+@contextmanager
+def upstream_slot(name: str):
+    """Hold one of the concurrency slots of an upstream for the duration of a call"""
+    semaphore = _get_limit(name)
+    with semaphore if semaphore is not None else nullcontext():
+        yield
@@ -1,10 +1,24 @@
-from typing import TypedDict, Annotated
-from langgraph.graph import StateGraph, END
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, TypedDict, Annotated
 from agents.extraction_agent import ExtractionAgent
 from agents.place_agent import PlaceAgent
 from agents.restaurants_agent import RestaurantsAgent
 from agents.hotels_agent import HotelsAgent
 from agents.itinerary_agent import ItineraryAgent
+from budget import BudgetModel, parse_amount
+from deadline import Deadline, RequestCancelled
+from gazetteer import get_gazetteer, resolve_destination
+from logging_setup import in_context, truncate
+from startup import lazy_import, timed
+import metrics
+
+if TYPE_CHECKING:
+    from langgraph.graph import StateGraph
+
+logger = logging.getLogger(__name__)
 
 class TravelPlanState(TypedDict):
     """State object for the travel planning workflow"""
@@ -15,8 +29,20 @@ class TravelPlanState(TypedDict):
     hotels: list
     itinerary: list
     budget_breakdown: dict
+    budget_model: dict
+    deadline: Deadline
+    skipped_nodes: list
     error: str | None
 
+class CityPlanState(TypedDict):
+    """State object for the per-destination places/restaurants/hotels sub-workflow"""
+    travel_details: dict
+    places: list
+    restaurants: list
+    hotels: list
+    deadline: Deadline
+    skipped_nodes: list
+
 class TravelPlanWorkflow:
     """LangGraph workflow orchestrating multiple agents"""
     
@@ -26,177 +52,375 @@ class TravelPlanWorkflow:
         self.restaurants_agent = RestaurantsAgent()
         self.hotels_agent = HotelsAgent()
         self.itinerary_agent = ItineraryAgent()
+
+        # Nodes are skipped when less than this much of the request budget is left
+        self.node_min_seconds = float(os.getenv("PLAN_NODE_MIN_SECONDS", "3"))
+
+        # Most destinations of a multi-city trip planned at once, on a pool of the request's own
+        self.city_workers = max(int(os.getenv("CITY_WORKERS", "4")), 1)
+
+        # Web searches started from a guessed destination while extraction is still running
+        self.speculative_prefetch = os.getenv("SPECULATIVE_PREFETCH", "1").lower() not in ("0", "false", "no")
+        self.prefetch_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("PREFETCH_WORKERS", "6")),
+            thread_name_prefix="prefetch"
+        )
         
-        # Build the workflow graph
-        self.workflow = self._build_workflow()
+        # The graphs (and langgraph itself) are built on first use
+        self._city_workflow = None
+        self._workflow = None
+        self._graphs_lock = threading.Lock()
+
+    def _ensure_graphs(self):
+        if self._workflow is None:
+            with self._graphs_lock:
+                if self._workflow is None:
+                    lazy_import("langgraph.graph")
+                    with timed("graphs", "construct"):
+                        self._city_workflow = self._build_city_workflow()
+                        self._workflow = self._build_workflow()
+
+    @property
+    def workflow(self):
+        self._ensure_graphs()
+        return self._workflow
+
+    @property
+    def city_workflow(self):
+        self._ensure_graphs()
+        return self._city_workflow
 
-    def _build_workflow(self) -> StateGraph:
+    def warm_up(self):
+        """Build the graphs, every agent's clients and the budget engine ahead of the first request"""
+        self._ensure_graphs()
+        lazy_import("numpy")
+        for agent in (self.extraction_agent, self.places_agent, self.restaurants_agent, self.hotels_agent, self.itinerary_agent):
+            agent.warm_up()
+
+    def _build_workflow(self) -> "StateGraph":
         """Build the langgraph workflow"""
+        from langgraph.graph import StateGraph, END
 
         # create a graph
         workflow = StateGraph(TravelPlanState)
         
         # node for agents
-        workflow.add_node("extract", self._extract_node)
-        workflow.add_node("find_places", self._places_node)
-        workflow.add_node("find_restaurants", self._restaurants_node)
-        workflow.add_node("find_hotels", self._hotels_node)
-        workflow.add_node("create_itinerary", self._itinerary_node)
+        workflow.add_node("extract", self._timed("extract", self._extract_node))
+        workflow.add_node("plan_destinations", self._timed("plan_destinations", self._destinations_node))
+        workflow.add_node("create_itinerary", self._timed("create_itinerary", self._itinerary_node))
 
         # define worflow edges
         workflow.set_entry_point("extract")
-        workflow.add_edge("extract", "find_places")
-        workflow.add_edge("find_places", "find_restaurants")
-        workflow.add_edge("find_restaurants", "find_hotels")
-        workflow.add_edge("find_hotels", "create_itinerary")
+        workflow.add_edge("extract", "plan_destinations")
+        workflow.add_edge("plan_destinations", "create_itinerary")
         workflow.add_edge("create_itinerary", END)
 
 
         return workflow.compile()
 
+    def _build_city_workflow(self) -> "StateGraph":
+        """Build the sub-workflow run once per destination"""
+        from langgraph.graph import StateGraph, END
+
+        workflow = StateGraph(CityPlanState)
+
+        workflow.add_node("find_places", self._timed("find_places", self._places_node))
+        workflow.add_node("find_restaurants", self._timed("find_restaurants", self._restaurants_node))
+        workflow.add_node("find_hotels", self._timed("find_hotels", self._hotels_node))
+
+        workflow.set_entry_point("find_places")
+        workflow.add_edge("find_places", "find_restaurants")
+        workflow.add_edge("find_restaurants", "find_hotels")
+        workflow.add_edge("find_hotels", END)
+
+        return workflow.compile()
+
+    def _timed(self, name: str, node):
+        """Record the node's wall-clock and CPU time when the request is being profiled"""
+        def run(state):
+            profile = state["deadline"].profile
+            if profile is None:
+                return node(state)
+            destination = state["travel_details"].get("destination") if "user_input" not in state else None
+            labels = {"destination": destination} if destination else {}
+            with profile.track(name, **labels):
+                return node(state)
+        return run
+
+    def _should_skip(self, state: TravelPlanState, node: str) -> bool:
+        """Skip a node when the request deadline does not leave enough time to run it"""
+        deadline = state["deadline"]
+        # A cancelled request stops the whole graph here, between nodes
+        deadline.raise_if_cancelled("nodes")
+        if deadline.has_time_for(self.node_min_seconds):
+            return False
+        logger.warning("⏱️ Skipping %s, only %.1fs left", node, deadline.remaining())
+        state["skipped_nodes"] = state["skipped_nodes"] + [node]
+        return True
+
+    def _mark_if_expired(self, state: TravelPlanState, node: str):
+        """Record a node that failed because it ran out of time"""
+        if state["deadline"].expired() and node not in state["skipped_nodes"]:
+            state["skipped_nodes"] = state["skipped_nodes"] + [node]
+
     def _extract_node(self, state:TravelPlanState) -> TravelPlanState:
         """Node for extraction agent"""
-        print("Extracting travel details")
+        logger.info("Extracting travel details")
+
+        state['deadline'].raise_if_cancelled("nodes")
+        prefetch = self._start_prefetch(state['user_input'], state['deadline'])
 
         try:
-            travel_details = self.extraction_agent.extract_details(state['user_input'])
-            print("🧠 Extracted raw:", travel_details)
+            travel_details = self.extraction_agent.extract_details(state['user_input'], state['deadline'])
+            self._canonicalize_destinations(travel_details)
+            self._settle_prefetch(prefetch, travel_details)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🧠 Extracted raw: %s", truncate(travel_details))
             state['travel_details'] = travel_details
-            print(f"✅ Extracted: {travel_details.get('destination')} - {travel_details.get('duration')} days")
+            logger.info("✅ Extracted: %s - %s days", travel_details.get('destination'), travel_details.get('duration'))
+        except RequestCancelled:
+            self._settle_prefetch(prefetch, {})
+            raise
         except Exception as e:
-            print(f"❌ Extraction error: {e}")
+            logger.error("❌ Extraction error: %s", e)
             state['error'] = str(e)
+            self._settle_prefetch(prefetch, {})
 
         return state
     
-    def _places_node(self, state: TravelPlanState) -> TravelPlanState:
+    def _start_prefetch(self, user_input: str, deadline: Deadline) -> dict:
+        """Guess destinations from the raw input and start their web searches right away
+
+        The searches go through the shared single-flight cache, so when extraction
+        confirms a guess the agents join the in-flight (or finished) search instead of
+        starting their own.
+        """
+        if not self.speculative_prefetch:
+            return {}
+
+        prefetch = {}
+        gazetteer = get_gazetteer()
+        for entry in gazetteer.find_in_text(user_input):
+            destination = gazetteer.canonical_name(entry)
+            details = {"destination": destination, "destination_id": entry["id"]}
+            futures = []
+            for kind, agent in (("place", self.places_agent), ("restaurant", self.restaurants_agent), ("hotel", self.hotels_agent)):
+                # The POI store will answer this one without searching
+                if len(agent.recall(kind, details, agent.MIN_ITEMS)) >= agent.MIN_ITEMS:
+                    continue
+                futures.append(in_context(
+                    self.prefetch_executor, agent.web_search, agent.search_query(destination), deadline, entry["id"]
+                ))
+            prefetch[entry["id"]] = futures
+
+        if prefetch:
+            logger.info("🔮 Prefetching searches for %s", ', '.join(prefetch))
+        return prefetch
+
+    def _settle_prefetch(self, prefetch: dict, travel_details: dict):
+        """Keep prefetches whose destination extraction confirmed, cancel the rest"""
+        confirmed = {d.get("destination_id") for d in travel_details.get("destinations", [])}
+        for destination_id, futures in prefetch.items():
+            if destination_id in confirmed:
+                metrics.increment("prefetch_confirmed")
+                continue
+            metrics.increment("prefetch_discarded")
+            for future in futures:
+                # Searches already running finish into the cache; queued ones never start
+                future.cancel()
+
+    def _canonicalize_destinations(self, travel_details: dict):
+        """Map extracted cities onto the gazetteer so cache keys and search queries are stable"""
+        gazetteer = get_gazetteer()
+        destinations = travel_details.get("destinations", [])
+
+        for destination in destinations:
+            entry = resolve_destination(destination["city"])
+            if entry:
+                destination.update({
+                    "city": gazetteer.canonical_name(entry),
+                    "destination_id": entry["id"],
+                    "country": entry["country"],
+                    "lat": entry["lat"],
+                    "lng": entry["lng"]
+                })
+
+        if len(destinations) == 1 and destinations[0].get("destination_id"):
+            travel_details["destination"] = destinations[0]["city"]
+            travel_details["destination_id"] = destinations[0]["destination_id"]
+
+    def _places_node(self, state: CityPlanState) -> CityPlanState:
         """Node for places agent"""
-        print("🏛️ Finding places to visit...")
+        logger.info("🏛️ Finding places to visit...")
+        if self._should_skip(state, "find_places"):
+            return state
         try:
-            places = self.places_agent.find_places(state["travel_details"])
+            places = self.places_agent.find_places(state["travel_details"], state["deadline"])
             state["places"] = places
-            print(f"✅ Found {len(places)} places")
+            logger.info("✅ Found %d places", len(places))
+        except RequestCancelled:
+            # Cancelled requests answer 499, not a partial plan
+            raise
         except Exception as e:
-            print(f"❌ Places error: {e}")
+            logger.error("❌ Places error: %s", e)
             state["places"] = []
+            self._mark_if_expired(state, "find_places")
         return state
     
-    def _restaurants_node(self, state: TravelPlanState) -> TravelPlanState:
+    def _restaurants_node(self, state: CityPlanState) -> CityPlanState:
         """Node for restaurants agent"""
-        print("🍽️ Finding restaurants...")
+        logger.info("🍽️ Finding restaurants...")
+        if self._should_skip(state, "find_restaurants"):
+            return state
         try:
-            restaurants = self.restaurants_agent.find_restaurants(state["travel_details"])
+            restaurants = self.restaurants_agent.find_restaurants(state["travel_details"], state["deadline"])
             state["restaurants"] = restaurants
-            print(f"✅ Found {len(restaurants)} restaurants")
+            logger.info("✅ Found %d restaurants", len(restaurants))
+        except RequestCancelled:
+            raise
         except Exception as e:
-            print(f"❌ Restaurants error: {e}")
+            logger.error("❌ Restaurants error: %s", e)
             state["restaurants"] = []
+            self._mark_if_expired(state, "find_restaurants")
         return state
 
-    def _hotels_node(self, state: TravelPlanState) -> TravelPlanState:
+    def _hotels_node(self, state: CityPlanState) -> CityPlanState:
         """Node for hotels agent"""
-        print("🏨 Finding hotels...")
+        logger.info("🏨 Finding hotels...")
+        if self._should_skip(state, "find_hotels"):
+            return state
         try:
-            hotels = self.hotels_agent.find_hotels(state["travel_details"])
+            hotels = self.hotels_agent.find_hotels(state["travel_details"], state["deadline"])
             state["hotels"] = hotels
-            print(f"✅ Found {len(hotels)} hotels")
+            logger.info("✅ Found %d hotels", len(hotels))
+        except RequestCancelled:
+            raise
         except Exception as e:
-            print(f"❌ Hotels error: {e}")
+            logger.error("❌ Hotels error: %s", e)
             state["hotels"] = []
+            self._mark_if_expired(state, "find_hotels")
         return state
     
+    def _destinations_node(self, state: TravelPlanState) -> TravelPlanState:
+        """Run the city sub-workflow for every destination concurrently and merge the results
+
+        A single destination runs on the request thread. A multi-city trip gets a pool of
+        its own, so it never queues behind the cities of other requests.
+        """
+        state["deadline"].raise_if_cancelled("nodes")
+        travel_details = state["travel_details"]
+        destinations = travel_details.get("destinations") or [
+            {"city": travel_details.get("destination", "Unknown"), "days": travel_details.get("duration", 7)}
+        ]
+        logger.info("🗺️ Planning %d destination(s): %s", len(destinations), ', '.join(d['city'] for d in destinations))
+
+        if len(destinations) == 1:
+            city_states = [self._plan_city(travel_details, destinations[0], state["deadline"])]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(len(destinations), self.city_workers),
+                thread_name_prefix="city"
+            ) as executor:
+                futures = [
+                    self._submit(executor, state["deadline"], self._plan_city, travel_details, destination, state["deadline"])
+                    for destination in destinations
+                ]
+                city_states = [future.result() for future in futures]
+
+        # Merge in trip order so places/restaurants/hotels stay grouped by city
+        for city_state in city_states:
+            state["places"] = state["places"] + city_state["places"]
+            state["restaurants"] = state["restaurants"] + city_state["restaurants"]
+            state["hotels"] = state["hotels"] + city_state["hotels"]
+            for node in city_state["skipped_nodes"]:
+                if node not in state["skipped_nodes"]:
+                    state["skipped_nodes"] = state["skipped_nodes"] + [node]
+        return state
+
+    def _submit(self, executor: ThreadPoolExecutor, deadline: Deadline, fn, *args):
+        """Submit work that belongs to this request, keeping its log request id and profile"""
+        if deadline.profile is None:
+            return in_context(executor, fn, *args)
+        return in_context(executor, self._attached, deadline.profile, fn, *args)
+
+    @staticmethod
+    def _attached(profile, fn, *args):
+        with profile.attach():
+            return fn(*args)
+
+    def _plan_city(self, travel_details: dict, destination: dict, deadline: Deadline) -> CityPlanState:
+        """Run places/restaurants/hotels for one destination of the trip"""
+        duration = parse_amount(travel_details.get("duration"), 7.0) or 1.0
+        city_details = {
+            **travel_details,
+            "destination": destination["city"],
+            "destination_id": destination.get("destination_id"),
+            "duration": destination["days"],
+            # Share of the total budget proportional to the days spent in this city
+            "budget": round(parse_amount(travel_details.get("budget"), 2000.0) * destination["days"] / duration)
+        }
+
+        city_state = self.city_workflow.invoke({
+            "travel_details": city_details,
+            "places": [],
+            "restaurants": [],
+            "hotels": [],
+            "deadline": deadline,
+            "skipped_nodes": []
+        })
+
+        for key in ("places", "restaurants", "hotels"):
+            for item in city_state[key]:
+                item["city"] = destination["city"]
+        return city_state
+
     def _itinerary_node(self, state: TravelPlanState) -> TravelPlanState:
         """Node for itinerary agent"""
-        print("📅 Creating day-by-day itinerary...")
-        try:
-            itinerary = self.itinerary_agent.create_itinerary(
-                state["travel_details"],
-                state["places"],
-                state["restaurants"]
-            )
-            state["itinerary"] = itinerary
-            print(f"✅ Created {len(itinerary)} day itinerary")
-            
-            # Calculate budget breakdown
-            state["budget_breakdown"] = self._calculate_budget(state)
-            print(f"💰 Budget breakdown calculated")
-        except Exception as e:
-            print(f"❌ Itinerary error: {e}")
-            state["itinerary"] = []
+        logger.info("📅 Creating day-by-day itinerary...")
+        if not self._should_skip(state, "create_itinerary"):
+            try:
+                itinerary = self.itinerary_agent.create_itinerary(
+                    state["travel_details"],
+                    state["places"],
+                    state["restaurants"],
+                    state["deadline"]
+                )
+                state["itinerary"] = itinerary
+                logger.info("✅ Created %d day itinerary", len(itinerary))
+            except RequestCancelled:
+                raise
+            except Exception as e:
+                logger.error("❌ Itinerary error: %s", e)
+                state["itinerary"] = []
+                self._mark_if_expired(state, "create_itinerary")
+
+        # Budget breakdown is local work, so it is computed from whatever data we have
+        model = self._budget_model(state)
+        state["budget_breakdown"] = model.breakdown()
+        # Every hotel x budget x traveler count, so the client can reprice without a new run
+        state["budget_model"] = {"components": model.components(), "scenarios": model.evaluate()}
+        logger.info("💰 Budget breakdown calculated")
         return state
 
+    def _budget_model(self, state: TravelPlanState) -> BudgetModel:
+        return BudgetModel(
+            state.get("travel_details", {}),
+            state.get("hotels", []),
+            state.get("itinerary", []),
+            state.get("places", [])
+        )
+
     def _calculate_budget(self, state: TravelPlanState) -> dict:
-        import re
-
-        def extract_cost(cost_str: str) -> float:
-            """Extract numeric cost from string like '$50-100' or '$50'"""
-            if not cost_str or cost_str == "Free" or cost_str == "N/A":
-                return 0
-            # Find all numbers in the string
-            numbers = re.findall(r'\d+', str(cost_str))
-            if numbers:
-                # Take the average if range, otherwise first number
-                if len(numbers) >= 2:
-                    return (float(numbers[0]) + float(numbers[1])) / 2
-                return float(numbers[0])
-            return 0
-        
+        """Point estimate: cheapest hotel per city, itinerary day costs, entry fees, 12%/8% of budget"""
+        return self._budget_model(state).breakdown()
 
-        # Calculate accommodation cost
-        hotels = state.get("hotels", [])
-        hotel_costs = []
-        for hotel in hotels:
-            total_cost = extract_cost(hotel.get("total_estimated", "0"))
-            hotel_costs.append(total_cost)
-        
-        accommodation_cost = min(hotel_costs) if hotel_costs else 0
-        
-        # Calculate food cost from itinerary
-        food_cost = 0
-        itinerary = state.get("itinerary", [])
-        for day in itinerary:
-            food_cost += extract_cost(day.get("estimated_cost", "0"))
-        
-        # Calculate activities/entry fees cost
-        activities_cost = 0
-        places = state.get("places", [])
-        for place in places:
-            activities_cost += extract_cost(place.get("entry_fee", "0"))
-        
-        # Estimate transportation (10-15% of budget)
-        budget = state.get("travel_details", {}).get("budget", 2000)
-        transportation_cost = budget * 0.12
-        
-        # Miscellaneous (5-10% of budget)
-        miscellaneous_cost = budget * 0.08
-
-        total_estimated = (
-            accommodation_cost +
-            food_cost +
-            activities_cost +
-            transportation_cost +
-            miscellaneous_cost
-        )
-        
-        remaining_budget = budget - total_estimated
-        
-        return {
-            "accommodation": round(accommodation_cost, 2),
-            "food": round(food_cost, 2),
-            "activities": round(activities_cost, 2),
-            "transportation": round(transportation_cost, 2),
-            "miscellaneous": round(miscellaneous_cost, 2),
-            "total_estimated": round(total_estimated, 2),
-            "user_budget": budget,
-            "remaining": round(remaining_budget, 2),
-            "within_budget": remaining_budget >= 0
-        }
-    
+    def plan_travel(self, user_input:str, deadline: Deadline | None = None) -> dict:
+        """Execute the full travel planning workflow within the request deadline"""
+        if deadline is None:
+            deadline = Deadline.from_request()
 
-    def plan_travel(self, user_input:str) -> dict:
-        """Execute the full travel planning workflow"""
-        print(f"\n🚀 Starting travel planning workflow...")
-        print(f"📝 User input: {user_input[:100]}...")
+        logger.info("🚀 Starting travel planning workflow (%gs budget)...", deadline.budget)
+        logger.info("📝 User input: %s", truncate(user_input, 100))
         
         # Initialize state
         initial_state = {
@@ -207,13 +431,20 @@ class TravelPlanWorkflow:
             "hotels": [],
             "itinerary": [],
             "budget_breakdown": {},
+            "budget_model": {},
+            "deadline": deadline,
+            "skipped_nodes": [],
             "error": None
         }
 
         # execute the workflow
-        final_state = self.workflow.invoke(initial_state)
+        try:
+            final_state = self.workflow.invoke(initial_state)
+        except RequestCancelled as e:
+            logger.warning("🛑 Workflow cancelled: %s", e)
+            return {"error": str(e), "cancelled": True}
 
-        print(f"\n✅ Workflow complete!")
+        logger.info("✅ Workflow complete!")
         return {
             "travel_details": final_state.get("travel_details", {}),
             "places": final_state.get("places", []),
@@ -221,6 +452,10 @@ class TravelPlanWorkflow:
             "hotels": final_state.get("hotels", []),
             "itinerary": final_state.get("itinerary", []),
             "budget_breakdown": final_state.get("budget_breakdown", {}),
+            "budget_model": final_state.get("budget_model", {}),
+            "partial": bool(final_state.get("skipped_nodes") or deadline.degraded),
+            "skipped_nodes": final_state.get("skipped_nodes", []),
+            "degraded": deadline.degraded,
             "error": final_state.get("error")
         }
 